@@ -0,0 +1,124 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_modrinth import FakeModrinth, GAME_VERSION, LOADER
+
+MCSMP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'mcsmp.py')
+
+# run mcsmp.py as __main__ and write its peak memory in a file at exit
+LAUNCHER = '''
+import atexit, runpy, sys
+def peak(path):
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        rss = rss if sys.platform == 'darwin' else rss*1024
+    except ImportError:
+        rss = 0
+    with open(path, 'w') as f:
+        f.write(str(rss))
+atexit.register(peak, sys.argv[1])
+sys.argv = sys.argv[2:]
+runpy.run_path(sys.argv[0], run_name='__main__')
+'''
+
+
+class Bench:
+    def __init__(self, fake: FakeModrinth, workdir, options=[]):
+        self.fake = fake
+        self.workdir = workdir
+        self.options = options
+        # a copy of mcsmp.py, to keep its cache and its settings inside the work folder
+        self.mcsmp = os.path.join(workdir, 'mcsmp.py')
+        shutil.copyfile(MCSMP, self.mcsmp)
+
+    def run(self, *args, check=False):
+        peak_file = os.path.join(self.workdir, '.peak')
+        cmd = [sys.executable, '-c', LAUNCHER, peak_file, self.mcsmp, '--api-url', self.fake.api_url] + self.options + list(args)
+
+        self.fake.reset_stats()
+        start = time.perf_counter()
+        rslt = subprocess.run(cmd, cwd=self.workdir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        wall = time.perf_counter() - start
+
+        if rslt.returncode and check:
+            print(rslt.stdout)
+            raise SystemExit(f'The command {" ".join(args)!r} failed')
+        with open(peak_file) as f:
+            peak = int(f.read() or 0)
+        return {
+            'wall': wall,
+            'requests': self.fake.requests,
+            'bytes': self.fake.bytes,
+            'peak_rss': peak,
+            'returncode': rslt.returncode,
+        }
+
+
+def bench_size(projects, args):
+    fake = FakeModrinth(projects, file_size=args.file_size, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix=f'mcsmp-bench-{projects}-')
+    try:
+        options = ['--engine', args.engine]
+        bench = Bench(fake, workdir, options)
+        minecraft = os.path.join(workdir, 'minecraft')
+        os.makedirs(minecraft)
+        bench.run('directory-add', 'bench', minecraft, check=True)
+        bench.run('version', 'bench', GAME_VERSION, check=True)
+        bench.run('loader', 'bench', LOADER, check=True)
+
+        jobs = ['--jobs', str(args.jobs)]
+        results = {}
+        results['install'] = bench.run('install', 'bench', 'bench-pack', *jobs)
+        fake.publish_updates()
+        results['update'] = bench.run('update', 'bench', *jobs)
+        results['update (no change)'] = bench.run('update', 'bench', *jobs)
+        results['list'] = bench.run('list', 'bench')
+        results['info'] = bench.run('info', fake.slugs[0])
+        return results
+    finally:
+        fake.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def format_size(size):
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark mcsmp against a local stand-in of the Modrinth API (offline)')
+    parser.add_argument('--sizes', metavar='N', type=int, nargs='+', default=[10, 100, 1000], help='numbers of projects of the synthetic directories')
+    parser.add_argument('--latency', metavar='SECONDS', type=float, default=0.0, help='delay added to every response of the server')
+    parser.add_argument('--file-size', metavar='BYTES', type=int, default=64*1024, help='size of the files of the projects')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=8, help='number of parallel downloads')
+    parser.add_argument('--engine', choices=['sync', 'threads'], default='sync', help='network engine of mcsmp')
+    parser.add_argument('--json', metavar='PATH', type=str, help='also write the results in a JSON file, to compare them between two versions')
+    parser.add_argument('--keep', action='store_true', help="don't delete the work folders")
+    args = parser.parse_args()
+
+    print(f'{"projects":>8}  {"command":<20}{"wall":>10}{"requests":>10}{"transferred":>13}{"peak RSS":>11}')
+    results = {}
+    for projects in args.sizes:
+        results[projects] = bench_size(projects, args)
+        for command, r in results[projects].items():
+            error = '  (failed)' if r['returncode'] else ''
+            print(f'{projects:>8}  {command:<20}{r["wall"]:>9.2f}s{r["requests"]:>10}{format_size(r["bytes"]):>13}{format_size(r["peak_rss"]):>11}{error}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
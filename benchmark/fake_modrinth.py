@@ -0,0 +1,197 @@
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+GAME_VERSION = '1.20.1'
+LOADER = 'fabric'
+
+
+class FakeModrinth:
+    # A local stand-in of the Modrinth API v2, with synthetic projects and injectable latency
+
+    def __init__(self, projects=10, file_size=64*1024, latency=0.0, host='127.0.0.1', port=0):
+        self.file_size = file_size
+        self.latency = latency
+        self.projects = {}
+        self.versions = {}
+        self.hashes = {}
+        self.dependencies = {}
+        self.files = {}
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self.url = f'http://{host}:{self.server.server_port}'
+        self.api_url = self.url + '/v2/'
+
+        # a library required by a quarter of the projects, and a pack that requires all of them
+        library = self.add_project('bench-lib')
+        slugs = [f'bench-mod-{i:04}' for i in range(projects)]
+        for i, slug in enumerate(slugs):
+            self.add_project(slug, [library] if i % 4 == 0 else [])
+        self.add_project('bench-pack', [self.projects[s]['id'] for s in slugs])
+        self.slugs = slugs
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+
+    def add_project(self, slug, dependencies=[]):
+        id = f'P{len(self.projects):07}'
+        self.projects[slug] = {
+            'id': id, 'slug': slug, 'project_type': 'mod', 'title': slug, 'description': f'The project {slug}',
+            'status': 'approved', 'published': '2023-01-01T00:00:00Z', 'updated': '2023-01-01T00:00:00Z',
+            'downloads': 0, 'followers': 0, 'categories': [], 'additional_categories': [], 'donation_urls': [],
+            'license': {'id': 'MIT', 'name': 'MIT'}, 'client_side': 'required', 'server_side': 'optional',
+            'source_url': None, 'discord_url': None, 'wiki_url': None, 'issues_url': None,
+            'game_versions': [GAME_VERSION], 'loaders': [LOADER], 'versions': [],
+        }
+        self.projects[id] = self.projects[slug]
+        self.dependencies[id] = dependencies
+        self.add_version(id)
+        return id
+
+    def add_version(self, project_id):
+        project = self.projects[project_id]
+        n = len(project['versions'])
+        id = f'V{project_id[1:]}{n:03}'
+        filename = f'{project["slug"]}-{n}.jar'
+        seed = filename.encode()
+        content = (seed * (self.file_size // len(seed) + 1))[:self.file_size]
+        self.files[filename] = content
+        self.versions[id] = {
+            'id': id, 'project_id': project_id, 'author_id': 'bench', 'name': filename, 'version_number': f'1.0.{n}',
+            'changelog': '', 'version_type': 'release', 'featured': False, 'status': 'listed', 'downloads': 0,
+            'date_published': (datetime(2023, 1, 1) + timedelta(days=n)).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'game_versions': [GAME_VERSION], 'loaders': [LOADER],
+            'dependencies': [{'project_id': d, 'version_id': None, 'file_name': None, 'dependency_type': 'required'} for d in self.dependencies[project_id]],
+            'files': [{
+                'url': f'{self.url}/files/{filename}', 'filename': filename, 'primary': True, 'size': len(content),
+                'hashes': {'sha1': hashlib.sha1(content).hexdigest(), 'sha512': hashlib.sha512(content).hexdigest()},
+            }],
+        }
+        self.hashes[self.versions[id]['files'][0]['hashes']['sha1']] = self.versions[id]
+        project['versions'].append(id)
+
+    def publish_updates(self):
+        # a new version for every project
+        for project_id in [p['id'] for slug, p in self.projects.items() if slug == p['slug']]:
+            self.add_version(project_id)
+
+    def project_versions(self, project, game_versions=None, loaders=None):
+        versions = [self.versions[v] for v in reversed(project['versions'])]
+        if game_versions:
+            versions = [v for v in versions if set(v['game_versions']) & set(game_versions)]
+        if loaders:
+            versions = [v for v in versions if set(v['loaders']) & set(loaders)]
+        return versions
+
+
+    def get(self, path, query):
+        parts = path.strip('/').split('/')
+        if parts[0] == 'files' and len(parts) == 2:
+            return self.files.get(parts[1], None)
+        if parts[0] != 'v2' or len(parts) < 2:
+            return None
+
+        parts = parts[1:]
+        param = lambda k: json.loads(query[k][0]) if k in query else None
+        if parts[0] == 'project' and len(parts) >= 2:
+            project = self.projects.get(parts[1], None)
+            if project and len(parts) == 3 and parts[2] == 'version':
+                return self.project_versions(project, param('game_versions'), param('loaders'))
+            return project if len(parts) == 2 else None
+        if parts[0] == 'projects':
+            return [self.projects[id] for id in param('ids') or [] if id in self.projects]
+        if parts[0] == 'version' and len(parts) == 2:
+            return self.versions.get(parts[1], None)
+        if parts[0] == 'versions':
+            return [self.versions[id] for id in param('ids') or [] if id in self.versions]
+        return None
+
+    def post(self, path, body):
+        parts = path.strip('/').split('/')[1:]
+        if parts == ['version_files']:
+            return {h:self.hashes[h] for h in body['hashes'] if h in self.hashes}
+        if parts == ['version_files', 'update']:
+            rslt = {}
+            for h in body['hashes']:
+                if h in self.hashes:
+                    versions = self.project_versions(self.projects[self.hashes[h]['project_id']], body.get('game_versions', None), body.get('loaders', None))
+                    if versions:
+                        rslt[h] = versions[0]
+            return rslt
+        return None
+
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, rslt):
+                if fake.latency:
+                    time.sleep(fake.latency)
+
+                if rslt is None:
+                    code, body, type = 404, b'{"error":"not_found"}', 'application/json'
+                elif isinstance(rslt, bytes):
+                    code, body, type = 200, rslt, 'application/java-archive'
+                else:
+                    code, body, type = 200, json.dumps(rslt).encode(), 'application/json'
+
+                with fake.lock:
+                    fake.requests += 1
+                    fake.bytes += len(body)
+
+                self.send_response(code)
+                self.send_header('Content-Type', type)
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('X-Ratelimit-Limit', '100000')
+                self.send_header('X-Ratelimit-Remaining', '100000')
+                self.send_header('X-Ratelimit-Reset', '60')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                self.reply(fake.get(url.path, parse_qs(url.query)))
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                self.reply(fake.post(url.path, body))
+
+        return Handler
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run a local stand-in of the Modrinth API with synthetic projects')
+    parser.add_argument('--projects', metavar='N', type=int, default=10, help='number of synthetic projects')
+    parser.add_argument('--latency', metavar='SECONDS', type=float, default=0.0, help='delay added to every response')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    fake = FakeModrinth(args.projects, latency=args.latency, port=args.port)
+    print(f'Fake Modrinth API on {fake.api_url} with {args.projects} projects (bench-mod-0000..., bench-pack requires all of them)')
+    fake.server.serve_forever()
@@ -1,9 +1,5 @@
 @echo off
 title mcsmp.py CLI
+set PYTHONPATH=%~dp0
 
-:loop
-set /p cmd=mcsmp.py 
-python %~dp0\mcsmp.py %cmd%
-set cmd=""
-echo.
-goto loop
+python -m mcsmp shell
@@ -1,13 +1,267 @@
 import argparse
-from sys import argv
+from sys import argv, exit
 import os
 import json
 from collections import namedtuple
-from datetime import datetime
+from contextlib import contextmanager
+from threading import RLock
+
+class Stats:
+    enabled = False
+    trace = None
+    _lock = RLock()
+    _start = None
+    _phases = {}
+    _endpoints = {}
+    _counters = {}
+    _events = []
+    _api_words = {'project', 'projects', 'version', 'versions', 'version_file', 'version_files', 'update', 'search', 'team', 'user', 'tag', 'dependencies'}
+    
+    def enable(trace=None):
+        from time import perf_counter
+        Stats.enabled = True
+        Stats.trace = trace
+        Stats._start = perf_counter()
+        Stats._phases = {}
+        Stats._endpoints = {}
+        Stats._counters = {}
+        Stats._events = []
+    
+    def _event(name, cat, start, duration, args=None):
+        from threading import get_ident
+        if Stats.trace:
+            Stats._events.append({
+                'name': name, 'cat': cat, 'ph': 'X', 'pid': os.getpid(), 'tid': get_ident(),
+                'ts': (start - Stats._start) * 1e6, 'dur': duration * 1e6, 'args': args or {},
+            })
+    
+    @contextmanager
+    def phase(name, **args):
+        if not Stats.enabled:
+            yield
+            return
+        
+        from time import perf_counter
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            with Stats._lock:
+                p = Stats._phases.setdefault(name, [0, 0.0])
+                p[0] += 1
+                p[1] += duration
+                Stats._event(name, 'phase', start, duration, args)
+    
+    def timed(name):
+        from functools import wraps
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kargs):
+                with Stats.phase(name):
+                    return func(*args, **kargs)
+            return wrapper
+        return decorator
+    
+    def count(name, n=1):
+        if Stats.enabled:
+            with Stats._lock:
+                Stats._counters[name] = Stats._counters.get(name, 0) + n
+    
+    def endpoint(method, url):
+        from urllib.parse import urlparse
+        if url.startswith(API_URL.rstrip('/') + '/'):
+            words = url[len(API_URL.rstrip('/')):].split('?')[0].strip('/').split('/')
+            return method + ' /' + '/'.join(w if w in Stats._api_words else '{id}' for w in words)
+        return method + ' ' + urlparse(url).netloc + ' (files)'
+    
+    def request(method, url, start, duration, status):
+        if Stats.enabled:
+            endpoint = Stats.endpoint(method, url)
+            with Stats._lock:
+                e = Stats._endpoints.setdefault(endpoint, [0, 0.0, 0.0])
+                e[0] += 1
+                e[1] += duration
+                e[2] = max(e[2], duration)
+                Stats._event(endpoint, 'request', start, duration, {'url': url, 'status': status})
+    
+    def hit(name, hit):
+        Stats.count(f'{name} {"hit" if hit else "miss"}')
+    
+    def report():
+        from time import perf_counter
+        
+        total = perf_counter() - Stats._start
+        print()
+        print('--== Stats ==--')
+        print(f'Total: {total:.3f}s')
+        if Stats._phases:
+            print('Phases:')
+            for name, (n, seconds) in sorted(Stats._phases.items(), key=lambda kv: -kv[1][1]):
+                print(f'    {name}: {seconds:.3f}s ({n} calls)')
+        if Stats._endpoints:
+            print('Requests:')
+            for name, (n, seconds, longest) in sorted(Stats._endpoints.items(), key=lambda kv: -kv[1][1]):
+                print(f'    {name}: {n} requests, {seconds:.3f}s, {seconds/n*1000:.1f}ms average, {longest*1000:.1f}ms max')
+        
+        counters = dict(Stats._counters)
+        hits = sorted({k.rsplit(' ', 1)[0] for k in counters if k.endswith((' hit', ' miss'))})
+        if hits:
+            print('Caches:')
+            for name in hits:
+                hit, miss = counters.pop(name + ' hit', 0), counters.pop(name + ' miss', 0)
+                print(f'    {name}: {hit} hits, {miss} misses ({hit/(hit+miss)*100:.0f}% hit rate)')
+        if counters:
+            print('Counters:')
+            for name, n in sorted(counters.items()):
+                print(f'    {name}: {n}')
+    
+    def as_dict():
+        from time import perf_counter
+        return {
+            'total': perf_counter() - Stats._start,
+            'phases': {k:{'calls':n, 'seconds':s} for k,(n,s) in Stats._phases.items()},
+            'requests': {k:{'count':n, 'seconds':s, 'max':m} for k,(n,s,m) in Stats._endpoints.items()},
+            'counters': dict(Stats._counters),
+        }
+    
+    def write(path):
+        # a Chrome trace (chrome://tracing or Perfetto) with the stats in its metadata
+        with Stats._lock:
+            _json(path, {'traceEvents': Stats._events, 'displayTimeUnit': 'ms', 'metadata': Stats.as_dict()})
+    
+    def at_exit(show=True):
+        from contextlib import redirect_stdout
+        from sys import stderr
+        
+        Stats.enabled = False
+        if show:
+            # on stderr, to keep the output of the command usable (like the JSON of update --plan --json)
+            with redirect_stdout(stderr):
+                Stats.report()
+        if Stats.trace:
+            Stats.write(Stats.trace)
+
+
+class ModrinthSession:
+    # requests is only imported, and the session created, by the first request
+    retries = 5
+    backoff = 0.5
+    backoff_max = 30
+    ratelimit_margin = 10
+    pool_maxsize = 32
+    timeout = (10, 60) # (connect, read) in seconds, a stalled connection is retried
+    user_agent = 'un-pogaz/MC-Modrinth-Project-Manager (un.pogaz@gmail.com)'
+    
+    def __init__(self):
+        from threading import Lock
+        self.retried = 0
+        self._lock = Lock()
+        self._next_request = {}
+        self._session = None
+    
+    @property
+    def session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                
+                session = requests.Session()
+                session.mount('https://', HTTPAdapter(pool_maxsize=self.pool_maxsize))
+                session.mount('http://', HTTPAdapter(pool_maxsize=self.pool_maxsize))
+                session.headers.update({'User-Agent':self.user_agent})
+                self._session = session
+        return self._session
+    
+    def set_pool_size(self, size):
+        # at least one connection by parallel job (--jobs), or urllib3 discards the extra connections
+        with self._lock:
+            if size <= self.pool_maxsize:
+                return
+            self.pool_maxsize = size
+            if self._session is not None:
+                from requests.adapters import HTTPAdapter
+                self._session.mount('https://', HTTPAdapter(pool_maxsize=size))
+                self._session.mount('http://', HTTPAdapter(pool_maxsize=size))
+    
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+    
+    def _wait_ratelimit(self, host):
+        from time import sleep, monotonic
+        with self._lock:
+            now = monotonic()
+            start, interval = self._next_request.get(host, (now, 0))
+            start = max(start, now)
+            self._next_request[host] = (start + interval, interval)
+        if start > now:
+            sleep(start - now)
+    
+    def _read_ratelimit(self, host, rslt):
+        from time import monotonic
+        try:
+            remaining = int(rslt.headers['X-Ratelimit-Remaining'])
+            reset = int(rslt.headers['X-Ratelimit-Reset'])
+        except (KeyError, ValueError):
+            return
+        
+        with self._lock:
+            start, _ = self._next_request.get(host, (monotonic(), 0))
+            if remaining <= self.ratelimit_margin:
+                # spread the remaining requests until the reset of the window
+                self._next_request[host] = (start, reset / max(remaining, 1))
+            else:
+                self._next_request[host] = (start, 0)
+    
+    def _retry_delay(self, attempt, rslt=None):
+        import random
+        if rslt is not None and rslt.status_code == 429:
+            for h in ['Retry-After', 'X-Ratelimit-Reset']:
+                try:
+                    return float(rslt.headers[h]) + random.uniform(0, 1)
+                except (KeyError, ValueError):
+                    pass
+        delay = min(self.backoff_max, self.backoff * 2**attempt)
+        return random.uniform(delay/2, delay)
+    
+    def request(self, method, url, *args, **kwargs):
+        from time import sleep, perf_counter
+        from urllib.parse import urlparse
+        
+        session = self.session
+        from requests.exceptions import ConnectionError, Timeout, ChunkedEncodingError
+        
+        host = urlparse(url).netloc
+        kwargs.setdefault('timeout', self.timeout)
+        attempt = 0
+        while True:
+            self._wait_ratelimit(host)
+            start = perf_counter()
+            try:
+                rslt = session.request(method, url, *args, **kwargs)
+                Stats.request(method, url, start, perf_counter() - start, rslt.status_code)
+            except (ConnectionError, Timeout, ChunkedEncodingError):
+                Stats.request(method, url, start, perf_counter() - start, None)
+                if attempt >= self.retries:
+                    raise
+                rslt = None
+            
+            if rslt is not None:
+                self._read_ratelimit(host, rslt)
+                if rslt.status_code != 429 and rslt.status_code < 500 or attempt >= self.retries:
+                    return rslt
+                rslt.close()
+            
+            sleep(self._retry_delay(attempt, rslt))
+            attempt += 1
+            with self._lock:
+                self.retried += 1
 
-import requests
-requests = requests.Session()
-requests.headers.update({'User-Agent':'un-pogaz/MC-Modrinth-Project-Manager (un.pogaz@gmail.com)'})
+requests = ModrinthSession()
 
 def join(*args: str):
     return os.path.join(*args).replace('\\', '/')
@@ -36,14 +290,46 @@ def root(data=None):
 def mcsmp_path(path):
     return join(path, '.mcsmp.json')
 
+def journal_path(path):
+    return join(path, '.mcsmp.journal')
+
+def journal_lock_path(path):
+    return join(path, '.mcsmp.journal.lock')
+
+def lock_file(f, blocking=True):
+    # exclusive lock of an open file, released when the file is closed (or when the process dies)
+    try:
+        import fcntl
+    except ImportError:
+        import msvcrt
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                return True
+            except OSError:
+                if not blocking:
+                    return False
+                from time import sleep
+                sleep(0.1)
+    
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        return True
+    except OSError:
+        return False
+
 class MCSMP(dict):
-    def __init__(self, directory: str, exit_if_error=True):
+    def __init__(self, directory: str, exit_if_error=True, read_only=False):
         self._directory = directory
         self._path = None
         self._mcsmp_path = None
-        self._load_data(exit_if_error=exit_if_error)
+        self._transaction = 0
+        self._journal = None
+        self._journal_lock = None
+        self._edited = False
+        self._load_data(exit_if_error=exit_if_error, read_only=read_only)
     
-    def _load_data(self, *, exit_if_error=True):
+    def _load_data(self, *, exit_if_error=True, read_only=False):
         self._path = root().get(self.directory, None)
         
         if not self.path:
@@ -69,21 +355,48 @@ class MCSMP(dict):
             if k not in self:
                 self[k] = {}
                 edited = True
-            
-            self[k] = sort_dict(self[k])
         
         for k in project_types_world.keys():
             for kk in list(self[k].keys()):
-                w = self[k][kk]
-                if w:
-                    self[k][kk] = sort_dict(w)
-                else:
+                if not self[k][kk]:
                     del self[k][kk]
                     edited = True
         
+        if read_only:
+            return
+        
+        # the journal of a running command is locked, only the journal of a dead command is recovered
+        if os.path.exists(journal_path(self.path)):
+            with open(journal_lock_path(self.path), 'a') as f:
+                if lock_file(f, False) and self._recover_journal():
+                    edited = True
+        
         if edited:
             self.commit()
     
+    def _recover_journal(self):
+        # the journal lock must be held
+        journal = journal_path(self.path)
+        if not os.path.exists(journal):
+            return False
+        
+        with open(journal, 'rt', encoding='utf-8') as f:
+            lines = [l for l in f.read().splitlines() if l.strip()]
+        
+        count = 0
+        for l in lines:
+            try:
+                type, urlslug, filename, world = json.loads(l)
+            except ValueError:
+                break
+            self.set_project(type, urlslug, filename, world)
+            count += 1
+        
+        print(f'Recovered {count} changes of an interrupted command in the directory {self.directory!r}')
+        self.commit()
+        safe_del(journal)
+        return True
+    
     @property
     def directory(self) -> str:
         return self._directory
@@ -146,8 +459,65 @@ class MCSMP(dict):
     def shader(self, value):
         self['shader'] = value
     
+    def set_project(self, type, urlslug, filename, world=None):
+        if world:
+            projects = self[type].setdefault(world, {})
+        else:
+            projects = self[type]
+        
+        if filename:
+            projects[urlslug] = filename
+        else:
+            projects.pop(urlslug, None)
+        if world and not projects:
+            del self[type][world]
+        
+        if self._journal:
+            self._journal.write(json.dumps([type, urlslug, filename, world], ensure_ascii=False) + '\n')
+            self._journal.flush()
+    
+    @contextmanager
+    def transaction(self, journal=False):
+        if journal and not self._journal:
+            self._journal_lock = open(journal_lock_path(self.path), 'a')
+            if not lock_file(self._journal_lock, False):
+                print(f'Waiting for another command running in the directory {self.directory!r}...')
+                lock_file(self._journal_lock)
+            self._recover_journal()
+            self._journal = open(journal_path(self.path), 'at', newline='\n', encoding='utf-8')
+        
+        self._transaction += 1
+        try:
+            yield self
+        finally:
+            self._transaction -= 1
+            if not self._transaction:
+                if self._edited:
+                    self.commit()
+                if self._journal:
+                    self._journal.close()
+                    self._journal = None
+                    safe_del(journal_path(self.path))
+                    self._journal_lock.close()
+                    self._journal_lock = None
+    
+    @Stats.timed('.mcsmp.json commit')
     def commit(self):
-        _json(self.mcsmp_path, self)
+        if self._transaction:
+            self._edited = True
+            return
+        
+        Stats.count('.mcsmp.json commits')
+        data = dict(self)
+        for k in project_types:
+            data[k] = sort_dict(self[k])
+        for k in project_types_world:
+            data[k] = {w:sort_dict(v) for w,v in sort_dict(self[k]).items() if v}
+        
+        path_tmp = self.mcsmp_path + '.tmp'
+        _json(path_tmp, data)
+        os.replace(path_tmp, self.mcsmp_path)
+        self._edited = False
 
 def safe_del(path):
     from shutil import rmtree
@@ -169,13 +539,12 @@ def safe_del(path):
         pass
 
 class Cache:
-    _cachefolder = join(os.path.dirname(argv[0]), '.cache')
+    # absolute, the daemon and the shell change the working directory between the commands
+    _cachefolder = join(os.path.dirname(os.path.abspath(argv[0])), '.cache')
     def _make_cachefolder():
-        cache_version = join(Cache._cachefolder, '.v1')
+        cache_version = join(Cache._cachefolder, '.v2')
         if not os.path.exists(cache_version):
             Cache.clear_cache()
-        
-        if not os.path.exists(Cache._cachefolder):
             os.makedirs(Cache._cachefolder, exist_ok=True)
             with open(cache_version, 'wt', newline='\n', encoding='utf-8') as f:
                 f.write('')
@@ -183,79 +552,369 @@ class Cache:
     def clear_cache(files=None):
         if files:
             for f in files:
-                safe_del(join(Cache._cachefolder, f))
+                if f in Cache._db_tables:
+                    if os.path.exists(Cache._db_path):
+                        for table in Cache._db_tables:
+                            if table == f or table.startswith(f+'_'):
+                                Cache._execute(f'DELETE FROM {table}')
+                else:
+                    safe_del(join(Cache._cachefolder, f))
             
             print('Cache files cleaned: ' + ', '.join(files))
         else:
-            safe_del(Cache._cachefolder)
+            Cache._close()
+            if os.path.isdir(Cache._cachefolder):
+                # the socket of a running daemon is kept
+                for f in os.listdir(Cache._cachefolder):
+                    if f != 'daemon.sock':
+                        safe_del(join(Cache._cachefolder, f))
             if files is not None:
                 print('Cache folder cleaned')
     
     
-    _project = None
-    _project_path = join(_cachefolder, 'project')
+    _db = None
+    _db_path = join(_cachefolder, 'cache.db')
+    _db_timeout = 5
+    _db_lock = RLock()
+    _db_tables = {
+        'project': 'id TEXT PRIMARY KEY, slug TEXT',
+        'version': 'id TEXT PRIMARY KEY, slug TEXT',
+        'slug': 'slug TEXT PRIMARY KEY, id TEXT, project_type TEXT',
+        'hashes': 'path TEXT, algo TEXT, size INTEGER, mtime_ns INTEGER, hash TEXT, PRIMARY KEY (path, algo)',
+        'catalog': 'project_id TEXT PRIMARY KEY, refreshed REAL',
+        'catalog_version': 'id TEXT PRIMARY KEY, project_id TEXT, version_number TEXT, published REAL, data TEXT',
+        'catalog_index': 'project_id TEXT, game_version TEXT, loader TEXT, published REAL, version_id TEXT',
+    }
+    _db_indexes = {
+        'catalog_version_number': 'catalog_version (project_id, version_number, published)',
+        'catalog_version_published': 'catalog_version (project_id, published)',
+        'catalog_index_latest': 'catalog_index (project_id, game_version, loader, published)',
+    }
     
-    def _read_project():
-        if not Cache._project:
-            Cache._project = _json(Cache._project_path)
+    def _connect():
+        with Cache._db_lock:
+            if Cache._db is None:
+                import sqlite3
+                
+                Cache._make_cachefolder()
+                # autocommit: each write (or batch of writes) is a short transaction, so the
+                # other mcsmp processes never wait for the end of a command to write in the cache
+                db = sqlite3.connect(Cache._db_path, timeout=Cache._db_timeout, isolation_level=None, check_same_thread=False)
+                db.execute(f'PRAGMA busy_timeout={Cache._db_timeout*1000}')
+                try:
+                    db.execute('PRAGMA journal_mode=WAL')
+                    db.execute('PRAGMA synchronous=NORMAL')
+                    for table, columns in Cache._db_tables.items():
+                        db.execute(f'CREATE TABLE IF NOT EXISTS {table} ({columns})')
+                    for index, columns in Cache._db_indexes.items():
+                        db.execute(f'CREATE INDEX IF NOT EXISTS {index} ON {columns}')
+                except sqlite3.OperationalError:
+                    pass
+                Cache._db = db
+            return Cache._db
+    
+    def _close():
+        with Cache._db_lock:
+            if Cache._db is not None:
+                Cache._db.close()
+                Cache._db = None
+    
+    # the cache is best-effort: a locked database is like an empty cache, it never stops a command
+    def _fetchone(sql, params=()):
+        from sqlite3 import OperationalError
+        Cache._connect()
+        with Cache._db_lock:
+            try:
+                return Cache._db.execute(sql, params).fetchone()
+            except OperationalError:
+                Stats.count('cache errors')
+                return None
     
-    def add_project(id, slug):
-        Cache._read_project()
-        if id not in Cache._project:
-            Cache._project[id] = slug
-            Cache._make_cachefolder()
-            _json(Cache._project_path, Cache._project)
+    def _fetchall(sql, params=()):
+        from sqlite3 import OperationalError
+        Cache._connect()
+        with Cache._db_lock:
+            try:
+                return Cache._db.execute(sql, params).fetchall()
+            except OperationalError:
+                Stats.count('cache errors')
+                return []
+    
+    def _execute(sql, params=()):
+        Cache._execute_batch([(sql, params)])
+    
+    def _execute_batch(statements):
+        # [(sql, params)] written in a single transaction, or not at all
+        from sqlite3 import OperationalError
+        Cache._connect()
+        with Cache._db_lock:
+            try:
+                if len(statements) == 1:
+                    Cache._db.execute(*statements[0])
+                    return
+                Cache._db.execute('BEGIN IMMEDIATE')
+                for sql, params in statements:
+                    Cache._db.execute(sql, params)
+                Cache._db.execute('COMMIT')
+            except OperationalError:
+                Stats.count('cache errors')
+                if Cache._db.in_transaction:
+                    Cache._db.execute('ROLLBACK')
+                # another process keeps the database locked, don't wait the full timeout for each write
+                Cache._db.execute('PRAGMA busy_timeout=100')
+    
+    def reset_timeout():
+        # a new command waits the full timeout again, even if the previous one met a locked database
+        with Cache._db_lock:
+            if Cache._db is not None:
+                Cache._db.execute(f'PRAGMA busy_timeout={Cache._db_timeout*1000}')
     
-    def get_project(id):
-        Cache._read_project()
-        return Cache._project.get(id, None)
     
+    def add_project(id, slug):
+        Cache._execute('INSERT OR IGNORE INTO project VALUES (?, ?)', (id, slug))
     
-    _version = None
-    _version_path = join(_cachefolder, 'version')
+    def get_project(id):
+        row = Cache._fetchone('SELECT slug FROM project WHERE id = ?', (id,))
+        Stats.hit('cache project', row)
+        return row[0] if row else None
     
-    def _read_version():
-        if not Cache._version:
-            Cache._version = _json(Cache._version_path)
     
     def add_version(id, slug):
-        Cache._read_version()
-        if id not in Cache._version:
-            Cache._version[id] = slug
-            Cache._make_cachefolder()
-            _json(Cache._version_path, Cache._version)
+        Cache._execute('INSERT OR IGNORE INTO version VALUES (?, ?)', (id, slug))
     
     def get_version(id):
-        Cache._read_version()
-        return Cache._version.get(id, None)
-    
+        row = Cache._fetchone('SELECT slug FROM version WHERE id = ?', (id,))
+        Stats.hit('cache version', row)
+        return row[0] if row else None
     
-    _slug = None
-    _slug_path = join(_cachefolder, 'slug')
-    
-    def _read_slug():
-        if not Cache._slug:
-            Cache._slug = _json(Cache._slug_path)
     
     def add_slug(slug, id, type):
-        Cache._read_slug()
-        if slug not in Cache._slug:
-            Cache._slug[slug] = {'id':id,'project_type':type}
-            Cache._make_cachefolder()
-            _json(Cache._slug_path, Cache._slug)
+        Cache._execute('INSERT OR IGNORE INTO slug VALUES (?, ?, ?)', (slug, id, type))
     
     def get_slug(slug):
-        Cache._read_slug()
-        return Cache._slug.get(slug, None)
+        row = Cache._fetchone('SELECT id, project_type FROM slug WHERE slug = ?', (slug,))
+        Stats.hit('cache slug', row)
+        return {'id':row[0],'project_type':row[1]} if row else None
+    
+    
+    def add_hash(path, stat, algo, hash):
+        key = os.path.abspath(path).replace('\\', '/')
+        Cache._execute('INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)', (key, algo, stat.st_size, stat.st_mtime_ns, hash))
+    
+    def get_hash(path, stat, algo):
+        key = os.path.abspath(path).replace('\\', '/')
+        row = Cache._fetchone('SELECT hash FROM hashes WHERE path = ? AND algo = ? AND size = ? AND mtime_ns = ?', (key, algo, stat.st_size, stat.st_mtime_ns))
+        return row[0] if row else None
+    
+    
+    def get_catalog_time(project_id):
+        row = Cache._fetchone('SELECT refreshed FROM catalog WHERE project_id = ?', (project_id,))
+        return row[0] if row else None
+    
+    def get_catalog_ids(project_id):
+        return {row[0] for row in Cache._fetchall('SELECT id FROM catalog_version WHERE project_id = ?', (project_id,))}
+    
+    def set_catalog(project_id, versions, ids=None):
+        # add the versions to the catalog of the project, ids: all the versions of the project, the others are removed (None for a full list)
+        from datetime import datetime
+        from time import time
+        
+        statements = []
+        if ids is None:
+            statements.append(('DELETE FROM catalog_version WHERE project_id = ?', (project_id,)))
+            statements.append(('DELETE FROM catalog_index WHERE project_id = ?', (project_id,)))
+        else:
+            ids = set(ids)
+            for id in Cache.get_catalog_ids(project_id) - ids:
+                statements.append(('DELETE FROM catalog_version WHERE id = ?', (id,)))
+                statements.append(('DELETE FROM catalog_index WHERE version_id = ?', (id,)))
+        
+        for v in versions:
+            v = compact_version(v)
+            published = datetime.fromisoformat(v['date_published']).timestamp()
+            statements.append(('DELETE FROM catalog_index WHERE version_id = ?', (v['id'],)))
+            statements.append(('INSERT OR REPLACE INTO catalog_version VALUES (?, ?, ?, ?, ?)', (v['id'], project_id, v['version_number'], published, json.dumps(v, separators=(',', ':')))))
+            for game_version in v['game_versions']:
+                for loader in v['loaders']:
+                    statements.append(('INSERT INTO catalog_index VALUES (?, ?, ?, ?, ?)', (project_id, game_version, loader, published, v['id'])))
+        
+        statements.append(('INSERT OR REPLACE INTO catalog VALUES (?, ?)', (project_id, time())))
+        Cache._execute_batch(statements)
+    
+    def get_catalog_version(project_id, version_number):
+        row = Cache._fetchone('SELECT data FROM catalog_version WHERE project_id = ? AND version_number = ? ORDER BY published DESC LIMIT 1', (project_id, version_number))
+        return json.loads(row[0]) if row else None
+    
+    def get_catalog_versions(project_id):
+        return [json.loads(row[0]) for row in Cache._fetchall('SELECT data FROM catalog_version WHERE project_id = ? ORDER BY published DESC', (project_id,))]
+    
+    def get_catalog_latest(project_id, game_version, loader=None):
+        # (published, version) of the newest version for a game version and a loader (any loader if None)
+        sql = 'SELECT catalog_index.published, data FROM catalog_index JOIN catalog_version ON catalog_version.id = version_id WHERE catalog_index.project_id = ? AND game_version = ?'
+        params = (project_id, game_version)
+        if loader:
+            sql += ' AND loader = ?'
+            params += (loader,)
+        row = Cache._fetchone(sql + ' ORDER BY catalog_index.published DESC LIMIT 1', params)
+        return (row[0], json.loads(row[1])) if row else (None, None)
+    
+    
+    store = False
+    _store_folder = join(_cachefolder, 'store')
+    _store_locks = {}
+    
+    def store_path(hash):
+        return join(Cache._store_folder, HASH_ALGO, hash[:2], hash)
+    
+    def store_lock(hash):
+        from threading import Lock
+        return Cache._store_locks.setdefault(hash, Lock())
+    
+    def gc_store():
+        count = 0
+        size = 0
+        for dirpath, dirnames, filenames in os.walk(Cache._store_folder):
+            for f in filenames:
+                path = join(dirpath, f)
+                stat = os.stat(path)
+                if stat.st_nlink <= 1:
+                    safe_del(path)
+                    count += 1
+                    size += stat.st_size
+        
+        print(f'Store cleaned: {count} unused files removed ({size} bytes)')
+    
+    
+    _partial_folder = join(_cachefolder, 'partial')
+    _partial_locks = {}
+    
+    def partial_path(hashes):
+        # the partial downloads are kept by expected hash, to be resumed by the next attempts
+        algo = 'sha512' if 'sha512' in hashes else HASH_ALGO
+        return join(Cache._partial_folder, algo+'-'+hashes[algo])
+    
+    def partial_lock(path):
+        from threading import Lock
+        return Cache._partial_locks.setdefault(path, Lock())
+    
+    
+    http_ttl_default = 15*60
+    http_ttl = http_ttl_default
+    http_size = 64*1024*1024
+    _http_folder = join(_cachefolder, 'http')
+    _http_edited = False
+    
+    def _http_path(key):
+        import hashlib
+        return join(Cache._http_folder, hashlib.sha1(key.encode('utf-8')).hexdigest())
+    
+    def evict_responses():
+        # called at the end of each command, so the daemon and the shell also keep the folder under http_size
+        if not Cache._http_edited or not os.path.isdir(Cache._http_folder):
+            return
+        Cache._http_edited = False
+        
+        entries = []
+        for f in os.scandir(Cache._http_folder):
+            stat = f.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, f.path))
+        
+        size = sum(e[1] for e in entries)
+        for _, s, path in sorted(entries):
+            if size <= Cache.http_size:
+                break
+            safe_del(path)
+            size -= s
+    
+    def add_response(key, entry):
+        Cache._make_cachefolder()
+        os.makedirs(Cache._http_folder, exist_ok=True)
+        with open(Cache._http_path(key), 'wt', newline='\n', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, separators=(',', ':')))
+        Cache._http_edited = True
+    
+    def get_response(key):
+        path = Cache._http_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            entry = _json(path)
+        except ValueError:
+            return None
+        if entry.get('url', None) != key:
+            return None
+        os.utime(path)
+        return entry
 
 HASH_ALGO = 'sha1'
-def hash_file(file):
-    if os.path.exists(file):
-        import hashlib
-        with open(file, 'rb') as f:
-            hash = hashlib.file_digest(f, HASH_ALGO)
-        return hash.hexdigest()
-    return None
+HASH_JOBS = min(8, os.cpu_count() or 1)
+HASH_CHUNK = 4*1024*1024
+HASH_MMAP = 64*1024*1024
+
+def digest_file(file, algos):
+    import hashlib
+    
+    hashers = [hashlib.new(algo) for algo in algos]
+    with open(file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= HASH_MMAP:
+            import mmap
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as view:
+                for i in range(0, size, HASH_CHUNK):
+                    for h in hashers:
+                        h.update(view[i:i+HASH_CHUNK])
+        else:
+            while chunk := f.read(HASH_CHUNK):
+                for h in hashers:
+                    h.update(chunk)
+    
+    return {algo:h.hexdigest() for algo, h in zip(algos, hashers)}
+
+@Stats.timed('hash')
+def hash_files(files, algos=[HASH_ALGO], jobs=HASH_JOBS):
+    # {file: {algo: hash}} of the existing files, read from the hash index or computed in parallel in one pass for all the algos
+    from concurrent.futures import ThreadPoolExecutor
+    
+    rslt = {}
+    missing = []
+    for file in dict.fromkeys(files):
+        if not file or not os.path.isfile(file):
+            rslt[file] = None
+            continue
+        
+        stat = os.stat(file)
+        hashes = {algo:Cache.get_hash(file, stat, algo) for algo in algos}
+        rslt[file] = hashes
+        if not all(hashes.values()):
+            missing.append((file, stat, [algo for algo,hash in hashes.items() if not hash]))
+    
+    def digest(args):
+        file, stat, algos = args
+        Stats.count('files hashed')
+        Stats.count('bytes hashed', stat.st_size)
+        try:
+            return digest_file(file, algos)
+        except OSError:
+            return None
+    
+    if len(missing) > 1 and jobs > 1:
+        with ThreadPoolExecutor(max_workers=min(jobs, len(missing))) as executor:
+            digests = list(executor.map(digest, missing))
+    else:
+        digests = [digest(m) for m in missing]
+    
+    for (file, stat, _), hashes in zip(missing, digests):
+        if hashes is None:
+            rslt[file] = None
+            continue
+        for algo, hash in hashes.items():
+            Cache.add_hash(file, stat, algo, hash)
+        rslt[file].update(hashes)
+    return rslt
+
+def hash_file(file, algo=HASH_ALGO):
+    hashes = hash_files([file], [algo])[file]
+    return hashes[algo] if hashes else None
 
 
 def directory_add(directory, path):
@@ -377,6 +1036,46 @@ project_types_world = {
 loaders_alt = {'quilt': ['fabric']}
 loaders_mods_swap = {'quilt': {'fabric-api':'qsl'}}
 
+DOWNLOAD_JOBS = 8
+
+class ThreadEngine:
+    # requests has no asyncio support: the concurrent engine is a thread pool, with at most host_limit calls in flight for each host
+    enabled = False
+    
+    def __init__(self, host_limit=DOWNLOAD_JOBS, executor=None):
+        # executor: a thread pool shared with other engines, that limits their total of concurrent calls
+        self.host_limit = max(1, host_limit)
+        self.executor = executor
+    
+    def map(self, calls):
+        # calls: [(url, func, args)], the url is used to limit the concurrent requests per host
+        from concurrent.futures import ThreadPoolExecutor
+        from threading import BoundedSemaphore
+        from urllib.parse import urlparse
+        
+        if not calls:
+            return []
+        
+        semaphores = {}
+        for url,_,_ in calls:
+            semaphores.setdefault(urlparse(url).netloc, BoundedSemaphore(self.host_limit))
+        
+        def call(c):
+            url, func, args = c
+            with semaphores[urlparse(url).netloc]:
+                return func(*args)
+        
+        if self.executor:
+            return list(self.executor.map(call, calls))
+        with ThreadPoolExecutor(max_workers=self.host_limit*len(semaphores)) as executor:
+            return list(executor.map(call, calls))
+
+def run_calls(calls, jobs=DOWNLOAD_JOBS, executor=None):
+    if ThreadEngine.enabled:
+        return ThreadEngine(jobs, executor).map(calls)
+    return [func(*args) for _, func, args in calls]
+InstallTask = namedtuple('InstallTask', 'urlslug project_type world version_project version_file path_filename path_filename_old')
+
 def test_filename(path_filename):
     enabled = True
     if not os.path.exists(path_filename) and os.path.exists(path_disabled(path_filename)):
@@ -397,12 +1096,12 @@ def list_directorys():
         print('No directorys has defined')
         return
     for name in r:
-        data = MCSMP(name, exit_if_error=False)
+        data = MCSMP(name, exit_if_error=False, read_only=True)
         if data:
             print(f'"{name}" : {data.version}/{data.loader} => "{data.path}"')
 
 def list_projects(directory):
-    data = MCSMP(directory, exit_if_error=False)
+    data = MCSMP(directory, exit_if_error=False, read_only=True)
     if not data:
         return
     
@@ -417,7 +1116,7 @@ def list_projects(directory):
                 print(urlslug + get_print_filename(enabled, present))
 
 def list_world_projects(directory, world):
-    data = MCSMP(directory, exit_if_error=False)
+    data = MCSMP(directory, exit_if_error=False, read_only=True)
     if not data:
         return
     
@@ -437,7 +1136,7 @@ def list_world_projects(directory, world):
 
 def project_check(directory, urlslug, world=None):
     urlslug = urlslug.lower()
-    data = MCSMP(directory)
+    data = MCSMP(directory, read_only=True)
     test_version(directory, data)
     
     if world:
@@ -482,47 +1181,227 @@ def path_enable(data, type, urlslug, enable, world=None):
         os.rename(path_filename, path_disabled(path_filename))
 
 
+API_URL_DEFAULT = os.environ.get('MCSMP_API_URL', 'https://api.modrinth.com/v2/')
+API_URL = API_URL_DEFAULT
 def link(*wanted):
-    return 'https://api.modrinth.com/v2/' + '/'.join(wanted)
+    return API_URL.rstrip('/') + '/' + '/'.join(wanted)
+
+def json_list(lst):
+    return json.dumps(list(lst), separators=(',', ':'))
+
+def get_json(urllink, params=None):
+    from time import time
+    from urllib.parse import urlencode
+    from requests.exceptions import RequestException
+    
+    params = params or {}
+    key = urllink + '?' + urlencode(sorted(params.items()))
+    entry = Cache.get_response(key)
+    now = time()
+    if entry and now - entry['time'] < Cache.http_ttl:
+        Stats.hit('http cache', True)
+        return entry['data']
+    Stats.hit('http cache', False)
+    
+    headers = {}
+    if entry and entry['etag']:
+        headers['If-None-Match'] = entry['etag']
+    if entry and entry['last_modified']:
+        headers['If-Modified-Since'] = entry['last_modified']
+    
+    try:
+        url = requests.get(urllink, params=params, headers=headers)
+    except RequestException:
+        if entry:
+            return entry['data']
+        raise
+    
+    if url.status_code == 304 and entry:
+        Stats.count('http cache revalidated')
+        entry['time'] = now
+        Cache.add_response(key, entry)
+        return entry['data']
+    
+    if not url.ok:
+        return None
+    
+    data = json.loads(url.content)
+    Cache.add_response(key, {
+        'url': key,
+        'etag': url.headers.get('ETag', None),
+        'last_modified': url.headers.get('Last-Modified', None),
+        'time': now,
+        'data': data,
+    })
+    return data
+
+def read_projects_file(path):
+    try:
+        with open(path, 'rt', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        print(f'Unable to read the projects list {path!r}: {e}')
+        exit()
+    return [l.split('#', 1)[0].strip() for l in lines if l.split('#', 1)[0].strip()]
 
-def project_install(directory, urlslug, world=None):
-    data = MCSMP(directory)
-    if install_project_file(directory, data, urlslug, world):
-        data.commit()
+def get_target_world(data: MCSMP, projects, world=None):
+    # legacy form <command> DIRECTORY PROJECT WORLD, when the second name is a world of the directory
+    if not world and len(projects) == 2 and not projects[1].startswith('@') and not has_magic(projects[1]):
+        if os.path.isdir(join(data.path, 'saves', projects[1])) and not is_installed(data, projects[1].lower()):
+            return projects[:1], projects[1]
+    return projects, world
 
-def project_update(directory, world=None):
+def has_magic(pattern):
+    return any(c in pattern for c in '*?[')
+
+def expand_projects(data: MCSMP, projects, world=None, _files=None):
+    # slugs, glob patterns over the installed slugs and @file lists (one slug or pattern by line)
+    from fnmatch import fnmatchcase
+    
+    if _files is None:
+        _files = set()
+    if world:
+        installed = sorted({urlslug for t in project_types_world for urlslug in data[t].get(world, {})})
+    else:
+        installed = sorted({urlslug for t in project_types for urlslug in data[t]})
+    
+    urlslugs = []
+    for p in projects:
+        if p.startswith('@'):
+            path = os.path.abspath(p[1:])
+            if path not in _files:
+                _files.add(path)
+                urlslugs.extend(expand_projects(data, read_projects_file(path), world, _files))
+        elif has_magic(p):
+            matches = [urlslug for urlslug in installed if fnmatchcase(urlslug, p.lower())]
+            if not matches:
+                print(f'No installed project match the pattern {p!r}')
+            urlslugs.extend(matches)
+        else:
+            urlslugs.append(p.lower())
+    return list(dict.fromkeys(urlslugs))
+
+def project_install(directory, projects, world=None, jobs=DOWNLOAD_JOBS):
     data = MCSMP(directory)
+    projects, world = get_target_world(data, projects, world)
+    urlslugs = expand_projects(data, projects, world)
+    if not urlslugs:
+        return
     
-    total = []
-    errors = []
+    tasks = []
+    errors = resolve_install_plan(directory, data, urlslugs, world, tasks)
+    
+    installed, download_errors = apply_install_tasks(directory, data, tasks, jobs)
+    errors.extend(download_errors)
+    if len(urlslugs) > 1:
+        print()
+        print(f'Finaly! {len(installed)} projects has been installed in {directory!r}')
+        if errors:
+            print('but... the following projects have suffered an error during their installation:')
+            print(', '.join(errors))
+
+def get_project_file(data: MCSMP, type, urlslug, world=None):
+    if world:
+        paths = [join(data.path, 'saves', world, project_types_world[type].folder, data[type][world][urlslug])]
+    else:
+        paths = [join(data.path, project_types[type].folder, data[type][urlslug])]
+        if type == 'shader':
+            paths.append(join(data.path, 'resourcepacks', data[type][urlslug]))
+    
+    for path_filename in paths:
+        for p in [path_filename, path_disabled(path_filename)]:
+            if os.path.exists(p):
+                return p
+    return None
+
+def fetch_versions_update(hashes, game_version, loaders):
+    if not hashes:
+        return {}
+    
+    body = {
+        'hashes': hashes,
+        'algorithm': HASH_ALGO,
+        'game_versions': [game_version],
+    }
+    if loaders:
+        body['loaders'] = loaders
     
+    url = requests.post(link('version_files', 'update'), json=body)
+    if not url.ok:
+        return {}
+    return json.loads(url.content)
+
+def get_installed_projects(directory, data: MCSMP, world=None):
+    projects = []
     if world:
         for type, pt in project_types_world.items():
             if pt.test(directory, data, world, False):
                 if world in list(data[type].keys()):
-                    for urlslug in data[type][world]:
-                        rslt = install_project_file(directory, data, urlslug, world)
-                        if rslt is None:
-                            errors.append(urlslug)
-                        if rslt:
-                            total.append(urlslug)
-                            data.commit()
-                        print()
-        
-        print(f'Finaly! {len(total)} projects has been updated in the world {world!r}" of {directory!r}')
-    
+                    projects.extend((type, urlslug) for urlslug in data[type][world])
     else:
         for type, pt in project_types.items():
             if pt.test(directory, data, False):
-                for urlslug in list(data[type].keys()):
-                    rslt = install_project_file(directory, data, urlslug)
-                    if rslt is None:
-                        errors.append(urlslug)
-                    if rslt:
-                        total.append(urlslug)
-                        data.commit()
-                    print()
+                projects.extend((type, urlslug) for urlslug in data[type])
+    return projects
+
+@Stats.timed('update lookup')
+def fetch_update_versions(targets):
+    # targets: [(data, world, projects)] of directories that share the same game version and loaders
+    versions = [{} for _ in targets]
+    game_version = targets[0][0].version
+    
+    paths = {}
+    for i, (data, world, projects) in enumerate(targets):
+        for type, urlslug in projects:
+            paths[(i, type, urlslug)] = get_project_file(data, type, urlslug, world)
+    files_hashes = hash_files(paths.values())
+    
+    types = []
+    calls = []
+    for type in {type for _,_,projects in targets for type,_ in projects}:
+        hashes = {}
+        for (i, t, urlslug), path_filename in paths.items():
+            if t == type and files_hashes[path_filename]:
+                hashes.setdefault(files_hashes[path_filename][HASH_ALGO], []).append((i, urlslug))
+        
+        all_loaders = get_all_loaders(get_project_loader(targets[0][0], type))
+        types.append((type, hashes))
+        calls.append((link('version_files', 'update'), fetch_versions_update, (list(hashes.keys()), game_version, all_loaders)))
+    
+    for (type, hashes), rslt in zip(types, run_calls(calls)):
+        for hash, version in rslt.items():
+            for i, urlslug in hashes.get(hash, []):
+                versions[i][urlslug] = (type, version)
+    return versions
+
+def project_update(directory, world=None, jobs=DOWNLOAD_JOBS, plan=None):
+    from contextlib import redirect_stdout, nullcontext
+    from sys import stderr
+    
+    data = MCSMP(directory, read_only=bool(plan))
+    projects = get_installed_projects(directory, data, world)
+    
+    with redirect_stdout(stderr) if plan == 'json' else nullcontext():
+        print('Checking the installed projects for updates...')
+        versions = fetch_update_versions([(data, world, projects)])[0]
+        print()
         
+        tasks = []
+        errors = resolve_install_plan(directory, data, [urlslug for _,urlslug in projects], world, tasks, versions)
+        print()
+    
+    if plan:
+        print_update_plans([get_update_plan(data, tasks, errors)], plan)
+        return
+    
+    total, download_errors = apply_install_tasks(directory, data, tasks, jobs)
+    errors.extend(download_errors)
+    if total:
+        print()
+    
+    if world:
+        print(f'Finaly! {len(total)} projects has been updated in the world {world!r}" of {directory!r}')
+    else:
         print(f'Finaly! {len(total)} projects has been updated in {directory!r}')
     
     if total:
@@ -531,292 +1410,972 @@ def project_update(directory, world=None):
         print('but... the following projects have suffered an error during their download:')
         print(', '.join(errors))
 
-def install_project_file(directory, data: MCSMP, urlslug, world=None):
-    urlslug = urlslug.lower()
-    loader = data.loader
+def project_update_all(jobs=DOWNLOAD_JOBS, plan=None):
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import redirect_stdout
+    from sys import stderr
     
+    if plan == 'json':
+        with redirect_stdout(stderr):
+            plans = project_update_all(jobs, 'plan')
+        print_update_plans(plans, plan)
+        return
+    
+    groups = {}
+    for directory in root():
+        data = MCSMP(directory, exit_if_error=False, read_only=bool(plan))
+        if data and test_version(directory, data, False):
+            groups.setdefault((data.version, data.loader, data.loader_shader), []).append(data)
+    
+    if not groups:
+        print('No directorys to update')
+        return [] if plan == 'plan' else None
+    
+    results = []
+    plans = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as downloads, ThreadPoolExecutor(max_workers=sum(len(g) for g in groups.values())) as directories:
+        for datas in groups.values():
+            print('Checking the installed projects for updates of: ' + ', '.join(repr(d.directory) for d in datas))
+            targets = [(d, None, get_installed_projects(d.directory, d)) for d in datas]
+            memo = {}
+            for (data, _, projects), versions in zip(targets, fetch_update_versions(targets)):
+                print()
+                tasks = []
+                errors = resolve_install_plan(data.directory, data, [urlslug for _,urlslug in projects], None, tasks, versions, memo)
+                if plan:
+                    plans.append(get_update_plan(data, tasks, errors))
+                else:
+                    future = directories.submit(apply_install_tasks, data.directory, data, tasks, jobs, downloads)
+                    results.append((data, projects, errors, future))
+        print()
+        
+        if plan == 'plan':
+            return plans
+        if plan:
+            print_update_plans(plans, plan)
+            return
+        
+        summary = []
+        for data, projects, errors, future in results:
+            total, download_errors = future.result()
+            errors = errors + download_errors
+            unchanged = [urlslug for _,urlslug in projects if urlslug not in total and urlslug not in errors]
+            summary.append((data.directory, total, unchanged, errors))
+    
+    print()
+    print('--== Summary ==--')
+    for directory, total, unchanged, errors in summary:
+        print(f'"{directory}" : {len(total)} updated, {len(unchanged)} unchanged, {len(errors)} failed')
+        if total:
+            print('    updated: ' + ', '.join(total))
+        if errors:
+            print('    failed: ' + ', '.join(errors))
+
+def get_update_plan(data: MCSMP, tasks: list, errors: list):
+    from shutil import disk_usage
+    
+    olds = {}
+    for i, t in enumerate(tasks):
+        path_filename_old = t.path_filename_old or t.path_filename
+        if t.project_type and os.path.exists(path_filename_old):
+            olds[i] = path_filename_old
+    files_hashes = hash_files(olds.values())
+    olds = {i:(p, files_hashes[p][HASH_ALGO]) for i,p in olds.items() if files_hashes[p]}
+    old_versions = fetch_versions_files(sorted({hash for _,hash in olds.values()}))
+    
+    # the real filenames, a disabled project is flagged instead
+    relpath = lambda path: os.path.relpath(path[:-len('.disabled')] if path.endswith('.disabled') else path, data.path).replace('\\', '/')
+    changes = []
+    for i, t in enumerate(tasks):
+        path_filename_old, hash = olds.get(i, (None, None))
+        changes.append({
+            'project': t.urlslug,
+            'type': t.project_type or 'assets',
+            'world': t.world,
+            'old_file': relpath(path_filename_old) if path_filename_old else None,
+            'new_file': relpath(t.path_filename),
+            'disabled': t.path_filename.endswith('.disabled'),
+            'old_version': old_versions.get(hash, {}).get('id', None),
+            'new_version': t.version_project['id'] if t.version_project else None,
+            'size': t.version_file.get('size', 0),
+        })
+    
+    download_size = sum(c['size'] for c in changes)
+    free_space = disk_usage(data.path).free
+    return {
+        'directory': data.directory,
+        'path': data.path,
+        'changes': changes,
+        'errors': errors,
+        'download_size': download_size,
+        'free_space': free_space,
+        'enough_space': download_size < free_space,
+    }
+
+def format_size(size):
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if size < 1024 or unit == 'GiB':
+            break
+        size /= 1024
+    return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+
+def print_update_plans(plans: list, plan='text'):
+    if plan == 'json':
+        print(json.dumps(plans, indent=2))
+    
+    else:
+        for p in plans:
+            print(f'--== Update plan of "{p["directory"]}" ==--')
+            for c in p['changes']:
+                world = f' [{c["world"]}]' if c['world'] else ''
+                world += ' [disabled]' if c['disabled'] else ''
+                if c['old_file']:
+                    print(f'{c["project"]}{world}: {c["old_file"]} ({c["old_version"]}) -> {c["new_file"]} ({c["new_version"]}), {format_size(c["size"])}')
+                else:
+                    print(f'{c["project"]}{world}: new {c["new_file"]} ({c["new_version"]}), {format_size(c["size"])}')
+            if not p['changes']:
+                print('Everything is up to date')
+            if p['errors']:
+                print('Errors: ' + ', '.join(p['errors']))
+            print(f'Download: {format_size(p["download_size"])} in {len(p["changes"])} files, free disk space: {format_size(p["free_space"])}')
+            if not p['enough_space']:
+                print('WARNING! Not enough free disk space for this update')
+            print()
+    
+    if not all(p['enough_space'] for p in plans):
+        exit(1)
+
+def get_project_data(urlslug):
     project_data = Cache.get_slug(urlslug)
     if not project_data:
-        urllink = link('project', urlslug)
-        url = requests.get(urllink)
-        if not url.ok:
+        project_data = get_json(link('project', urlslug))
+        if not project_data:
             print(f"Error during url request, the project {urlslug} probably doesn't exist")
             return None
-        
-        project_data = json.loads(url.content)
-    
-    project_id = project_data['id']
-    project_type = project_data['project_type']
-    Cache.add_project(project_id, urlslug)
-    Cache.add_slug(urlslug, project_id, project_type)
-    
     
+    Cache.add_project(project_data['id'], urlslug)
+    Cache.add_slug(urlslug, project_data['id'], project_data['project_type'])
+    return project_data
+
+def get_project_path(directory, data: MCSMP, urlslug, project_type, world=None):
     if world:
         if project_type == 'mod':
             project_type = 'datapack'
         
         if project_type not in project_types_world:
             print(f"The project {urlslug} has a type {project_type!r} incompatible with the argument [World]")
-            return False
+            return None, None
         
         pt = project_types_world[project_type]
         pt.test(directory, data, world)
-        base_path = join(data.path, 'saves', world, pt.folder)
+        return project_type, join(data.path, 'saves', world, pt.folder)
+    
     else:
-        
         if project_type not in project_types:
             print(f"The project {urlslug} has a type {project_type!r} incompatible for a global install")
-            return False
+            return None, None
         
         pt = project_types[project_type]
         pt.test(directory, data)
-        base_path = join(data.path, pt.folder)
-    
+        return project_type, join(data.path, pt.folder)
+
+def get_project_loader(data: MCSMP, project_type):
     if project_type == 'resourcepack':
-        loader = 'minecraft'
+        return 'minecraft'
     if project_type == 'shader':
-        loader = data.loader_shader
+        return data.loader_shader
     if project_type == 'datapack':
-        loader = 'datapack'
-    
-    print(f"Fetching versions of {urlslug} for Minecraft {data.version!r} and the loader {loader!r}...")
-    
+        return 'datapack'
+    return data.loader
+
+def get_all_loaders(loader):
     if loader:
-        all_loaders = [loader]+loaders_alt.get(loader, [])
-    else:
-        all_loaders = []
-    
-    params = {
-        'game_versions': f'["{data.version}"]',
-        'loaders': '['+','.join(['"'+x+'"' for x in all_loaders])+']',
-        'include_changelog': 'false',
+        return [loader]+loaders_alt.get(loader, [])
+    return []
+
+def compact_version(v):
+    # the fields of a version used by mcsmp, without the changelog and the statistics
+    return {
+        'id': v['id'],
+        'project_id': v['project_id'],
+        'name': v['name'],
+        'version_number': v['version_number'],
+        'date_published': v['date_published'],
+        'game_versions': v['game_versions'],
+        'loaders': v['loaders'],
+        'dependencies': [{k:d.get(k, None) for k in ['version_id', 'project_id', 'file_name', 'dependency_type']} for d in v['dependencies']],
+        'files': [{
+            'url': f['url'],
+            'filename': f['filename'],
+            'size': f.get('size', 0),
+            'primary': f.get('primary', False),
+            'hashes': {k:h for k,h in f['hashes'].items() if k in ['sha1', 'sha512']},
+        } for f in v['files']],
     }
-    versions = json.loads(requests.get(link('project', project_id, 'version'), params=params).content)
-    
-    valide_versions = []
-    if all_loaders:
-        for _loader in all_loaders:
-            for v in versions:
-                if _loader in v['loaders']:
-                    valide_versions.append(v)
-                    break
-            if len(valide_versions) == len(all_loaders):
-                break
-    elif versions:
-        valide_versions.append(versions[0])
+
+CATALOG_BATCH = 100
+def refresh_catalog(project_id):
+    # the versions of a project are kept in a catalog of the cache, only the new ones are requested
+    from time import time
+    from requests.exceptions import RequestException
+    
+    refreshed = Cache.get_catalog_time(project_id)
+    if refreshed is not None and time() - refreshed < Cache.http_ttl:
+        return
+    
+    try:
+        if refreshed is None:
+            versions = get_json(link('project', project_id, 'version'), {'include_changelog': 'false'})
+            if versions is not None:
+                Cache.set_catalog(project_id, versions)
+        
+        else:
+            project_data = get_json(link('project', project_id))
+            if project_data is None:
+                return
+            
+            known = Cache.get_catalog_ids(project_id)
+            ids = [id for id in project_data['versions'] if id not in known]
+            versions = []
+            for i in range(0, len(ids), CATALOG_BATCH):
+                versions.extend(get_json(link('versions'), {'ids': json_list(ids[i:i+CATALOG_BATCH])}) or [])
+            Cache.set_catalog(project_id, versions, project_data['versions'])
+    
+    except RequestException:
+        # offline, the catalog is used as it is
+        pass
+
+def fetch_project_version(project_id, game_version, all_loaders):
+    refresh_catalog(project_id)
     
     version_project = None
-    for v in valide_versions:
-        if not version_project:
-            version_project = v
-        if datetime.fromisoformat(version_project['date_published']) < datetime.fromisoformat(v['date_published']):
+    latest = None
+    for loader in all_loaders or [None]:
+        published, v = Cache.get_catalog_latest(project_id, game_version, loader)
+        if v and (latest is None or published > latest):
+            latest = published
             version_project = v
     
-    if not version_project:
-        print("No version available")
+    return version_project
+
+def fetch_projects_data(ids):
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    
+    projects = {}
+    for p in get_json(link('projects'), {'ids': json_list(ids)}) or []:
+        Cache.add_project(p['id'], p['slug'])
+        Cache.add_slug(p['slug'], p['id'], p['project_type'])
+        projects[p['id']] = p
+    return projects
+
+def get_dependencies_slugs(dependencies):
+    versions_projects = {}
+    versions_ids = set()
+    projects_ids = set()
+    for d in dependencies:
+        versionid = d.get('version_id', None)
+        projectid = d.get('project_id', None)
+        if versionid and Cache.get_version(versionid):
+            continue
+        if projectid:
+            projects_ids.add(projectid)
+            if versionid:
+                versions_projects[versionid] = projectid
+        elif versionid:
+            versions_ids.add(versionid)
+    
+    calls = []
+    if versions_ids:
+        calls.append((link('versions'), get_json, (link('versions'), {'ids': json_list(sorted(versions_ids))})))
+    calls.append((link('projects'), fetch_projects_data, ([id for id in projects_ids if not Cache.get_project(id)],)))
+    versions = run_calls(calls)[0] if versions_ids else []
+    
+    for v in versions or []:
+        versions_projects[v['id']] = v['project_id']
+        projects_ids.add(v['project_id'])
+    fetch_projects_data(id for id in projects_ids if not Cache.get_project(id))
+    
+    for versionid, projectid in versions_projects.items():
+        p_slug = Cache.get_project(projectid)
+        if p_slug:
+            Cache.add_version(versionid, p_slug)
+    
+    rslt = set()
+    for d in dependencies:
+        versionid = d.get('version_id', None)
+        projectid = d.get('project_id', None)
+        slug = (versionid and Cache.get_version(versionid)) or (projectid and Cache.get_project(projectid))
+        if slug:
+            rslt.add(slug)
+    return rslt
+
+def get_required_dependencies(version_project):
+    return [d for d in version_project['dependencies'] if d['dependency_type'] in ['required', 'embedded']]
+
+def is_installed(data: MCSMP, urlslug):
+    for type in project_types:
+        if urlslug in data[type]:
+            return True
+    return False
+
+@Stats.timed('resolve')
+def resolve_install_plan(directory, data: MCSMP, urlslugs, world, tasks: list, versions=None, memo=None):
+    # versions: {urlslug: (type, version_project)} already known, like the ones of a bulk update lookup
+    # memo: {(project_id, game_version, loaders): version_project} chosen versions, can be shared between calls
+    versions = versions or {}
+    if memo is None:
+        memo = {}
     
-    else:
-        Cache.add_version(version_project['id'], urlslug)
-        version_file = version_project['files'][0]
+    errors = []
+    resolved = set()
+    level = [urlslug.lower() for urlslug in urlslugs]
+    while level:
+        level = [urlslug for urlslug in dict.fromkeys(level) if urlslug not in resolved]
+        resolved.update(level)
+        fetch_projects_data(urlslug for urlslug in level if urlslug not in versions and not Cache.get_slug(urlslug))
+        if ThreadEngine.enabled:
+            prefetch_projects_versions(data, [urlslug for urlslug in level if urlslug not in versions], world, memo)
         
-        if project_type == 'shader' and version_project['loaders'][0] in ['vanilla', 'canvas']:
-            base_path = join(data.path, 'resourcepacks')
+        nodes = []
+        for urlslug in level:
+            if urlslug in versions:
+                type, version_project = versions[urlslug]
+                rslt = resolve_update_file(directory, data, type, urlslug, version_project, world, tasks)
+            else:
+                rslt, version_project = resolve_project_file(directory, data, urlslug, world, tasks, memo)
+            if rslt is None:
+                errors.append(urlslug)
+            if version_project:
+                nodes.append((urlslug, version_project))
         
-        os.makedirs(base_path, exist_ok=True)
+        get_dependencies_slugs([d for _,v in nodes for d in get_required_dependencies(v)])
         
-        filename = version_file['filename']
-        if world:
-            filename_old = data[project_type].get(world, {}).get(urlslug, None)
-        else:
-            filename_old = data[project_type].get(urlslug, None)
-        path_filename = join(base_path, filename)
+        level = []
+        for urlslug, version_project in nodes:
+            dependencies = get_dependencies_slugs(get_required_dependencies(version_project))
+            for kv in loaders_mods_swap.get(data.loader, {}).items():
+                if kv[0] in dependencies:
+                    dependencies.remove(kv[0])
+                    dependencies.add(kv[1])
+            dependencies = sorted(dependencies)
+            
+            if dependencies and world:
+                print(f'The project {urlslug!r} has dependencies, unfortunately, it is not possible to install them in a WORLD command mode')
+                print('You have install them manually: ' + ', '.join(dependencies))
+            else:
+                level.extend(d for d in dependencies if d not in resolved and not is_installed(data, d))
         
-        print(f"Got the link for {filename!r}")
+        level = sorted(set(level))
+        if level:
+            print('Installation of dependencies: ' + ', '.join(level))
+    
+    return errors
+
+def prefetch_projects_versions(data: MCSMP, urlslugs, world, memo: dict):
+    keys = []
+    calls = []
+    for urlslug in urlslugs:
+        project_data = Cache.get_slug(urlslug)
+        if not project_data:
+            continue
         
-        disabled = False
-        if os.path.exists(path_disabled(path_filename)):
+        project_type = project_data['project_type']
+        if world and project_type == 'mod':
+            project_type = 'datapack'
+        all_loaders = get_all_loaders(get_project_loader(data, project_type))
+        key = (project_data['id'], data.version, tuple(all_loaders))
+        if key not in memo and key not in keys:
+            keys.append(key)
+            calls.append((link('project', project_data['id'], 'version'), fetch_project_version, (project_data['id'], data.version, all_loaders)))
+    
+    if calls:
+        print(f'Fetching versions of {len(calls)} projects for Minecraft {data.version!r}...')
+        for key, version_project in zip(keys, run_calls(calls)):
+            memo[key] = version_project
+
+def resolve_project_file(directory, data: MCSMP, urlslug, world, tasks: list, memo: dict):
+    project_data = get_project_data(urlslug)
+    if not project_data:
+        return None, None
+    
+    project_type, base_path = get_project_path(directory, data, urlslug, project_data['project_type'], world)
+    if not project_type:
+        return False, None
+    
+    loader = get_project_loader(data, project_type)
+    all_loaders = get_all_loaders(loader)
+    key = (project_data['id'], data.version, tuple(all_loaders))
+    if key not in memo:
+        print(f"Fetching versions of {urlslug} for Minecraft {data.version!r} and the loader {loader!r}...")
+        memo[key] = fetch_project_version(project_data['id'], data.version, all_loaders)
+    version_project = memo[key]
+    
+    if not version_project:
+        print(f"No version available for {urlslug}")
+        return False, None
+    
+    return resolve_project_version(directory, data, urlslug, project_type, base_path, version_project, world, tasks), version_project
+
+def resolve_update_file(directory, data: MCSMP, type, urlslug, version_project, world, tasks: list):
+    project_type, base_path = get_project_path(directory, data, urlslug, type, world)
+    if not project_type:
+        return False
+    
+    return resolve_project_version(directory, data, urlslug, project_type, base_path, version_project, world, tasks)
+
+def resolve_project_version(directory, data: MCSMP, urlslug, project_type, base_path, version_project, world, tasks: list):
+    Cache.add_version(version_project['id'], urlslug)
+    version_file = version_project['files'][0]
+    
+    if project_type == 'shader' and version_project['loaders'][0] in ['vanilla', 'canvas']:
+        base_path = join(data.path, 'resourcepacks')
+    
+    filename = version_file['filename']
+    if world:
+        filename_old = data[project_type].get(world, {}).get(urlslug, None)
+    else:
+        filename_old = data[project_type].get(urlslug, None)
+    path_filename = join(base_path, filename)
+    
+    print(f"Got the link for {filename!r}")
+    
+    path_filename_old = None
+    disabled = os.path.exists(path_disabled(path_filename))
+    if filename_old:
+        path_filename_old = join(base_path, filename_old)
+        if os.path.exists(path_disabled(path_filename_old)):
             disabled = True
-            os.rename(path_disabled(path_filename), path_filename)
-        
-        if filename_old:
-            path_filename_old = join(base_path, filename_old)
-            if os.path.exists(path_disabled(path_filename_old)):
-                disabled = True
-                os.rename(path_disabled(path_filename_old), path_filename_old)
-        
-        installed = False
-        if filename_old and filename_old == filename and hash_file(path_filename) == version_file['hashes'][HASH_ALGO]:
-            if world:
-                print(f'The project {urlslug!r} is already up to date in the world {world!r} of {directory!r}')
-            else:
-                print(f'The project {urlslug!r} is already up to date in {directory!r}')
-        
+            path_filename_old = path_disabled(path_filename_old)
+    if disabled:
+        path_filename = path_disabled(path_filename)
+    
+    installed = False
+    if filename_old and filename_old == filename and hash_file(path_filename) == version_file['hashes'][HASH_ALGO]:
+        if world:
+            print(f'The project {urlslug!r} is already up to date in the world {world!r} of {directory!r}')
         else:
-            print("Downloading project...")
-            url = requests.get(version_file['url'])
-            if url.ok:
-                with open(path_filename, 'wb') as f:
-                    f.write(url.content)
-            else:
-                print("Downloading fail!")
+            print(f'The project {urlslug!r} is already up to date in {directory!r}')
+    
+    else:
+        if filename_old == filename:
+            path_filename_old = None
+        tasks.append(InstallTask(urlslug, project_type, world, version_project, version_file, path_filename, path_filename_old))
+        installed = True
+    
+    if world:
+        if len(version_project['files']) >= 2:
+            assets_file = version_project['files'][1]
+            assets_path = join(data.path, 'resourcepacks', assets_file['filename'])
+            if hash_file(assets_path) != assets_file['hashes'][HASH_ALGO]:
+                tasks.append(InstallTask(urlslug, None, world, version_project, assets_file, assets_path, None))
+    
+    return installed
+
+# small chunks, an interrupted download keeps everything but its last chunk
+DOWNLOAD_CHUNK = 64*1024
+def download_file(url, path, hashes=None):
+    if Cache.store and hashes and HASH_ALGO in hashes:
+        hash = hashes[HASH_ALGO]
+        path_store = Cache.store_path(hash)
+        with Cache.store_lock(hash):
+            Stats.hit('store', os.path.exists(path_store))
+            if not os.path.exists(path_store) and not fetch_file(url, path_store, hashes):
+                return False
+        
+        try:
+            link_file(path_store, path)
+        except OSError:
+            return False
+        Cache.add_hash(path, os.stat(path), HASH_ALGO, hash)
+        return True
+    
+    return fetch_file(url, path, hashes)
+
+def link_file(src, dst):
+    import shutil
+    
+    folder = os.path.dirname(dst)
+    os.makedirs(folder, exist_ok=True)
+    
+    dst_tmp = join(folder, '.'+os.path.basename(dst)+'.link')
+    safe_del(dst_tmp)
+    try:
+        os.link(src, dst_tmp)
+    except OSError:
+        shutil.copyfile(src, dst_tmp)
+    os.replace(dst_tmp, dst)
+
+DOWNLOAD_RETRIES = 2
+
+@Stats.timed('download')
+def fetch_file(url, path, hashes=None):
+    folder = os.path.dirname(path)
+    os.makedirs(folder, exist_ok=True)
+    
+    if not hashes or not ('sha512' in hashes or HASH_ALGO in hashes):
+        path_tmp = join(folder, '.'+os.path.basename(path)+'.part')
+        try:
+            return fetch_part(url, path, path_tmp, hashes, False)
+        finally:
+            safe_del(path_tmp)
+    
+    path_tmp = Cache.partial_path(hashes)
+    with Cache.partial_lock(path_tmp):
+        os.makedirs(Cache._partial_folder, exist_ok=True)
+        for attempt in range(DOWNLOAD_RETRIES+1):
+            rslt = fetch_part(url, path, path_tmp, hashes, True)
+            if rslt is not None:
+                return rslt
+            print(f'Download of {os.path.basename(path)!r} interrupted, resuming...' if attempt < DOWNLOAD_RETRIES else f'Download of {os.path.basename(path)!r} interrupted, it will be resumed by the next attempt')
+        return False
+
+def fetch_part(url, path, path_tmp, hashes, resume):
+    # True when the file is installed, False when it failed, None when it was interrupted and can be resumed
+    import hashlib
+    from requests.exceptions import RequestException
+    
+    hashers = {algo:hashlib.new(algo) for algo in [HASH_ALGO, 'sha512'] if algo == HASH_ALGO or (hashes and algo in hashes)}
+    start = os.path.getsize(path_tmp) if resume and os.path.exists(path_tmp) else 0
+    headers = {'Range': f'bytes={start}-'} if start else {}
+    try:
+        with requests.get(url, stream=True, headers=headers) as rslt:
+            if start and rslt.status_code == 416:
+                safe_del(path_tmp)
                 return None
+            if not rslt.ok:
+                return False
             
-            if filename_old and filename_old != filename:
-                safe_del(path_filename_old)
+            if start and rslt.status_code == 206 and rslt.headers.get('Content-Range', '').startswith(f'bytes {start}-'):
+                Stats.count('bytes resumed', start)
+                with open(path_tmp, 'rb') as f:
+                    while chunk := f.read(HASH_CHUNK):
+                        for h in hashers.values():
+                            h.update(chunk)
+                mode = 'ab'
+            else:
+                mode = 'wb'
             
-            if world:
-                if world not in data[project_type]:
-                    data[project_type][world] = {}
-                data[project_type][world][urlslug] = filename
-                
-                print(f'Done! The project {urlslug!r} has been installed in the world {world!r} of {directory!r}')
+            try:
+                with open(path_tmp, mode) as f:
+                    for chunk in rslt.iter_content(DOWNLOAD_CHUNK):
+                        for h in hashers.values():
+                            h.update(chunk)
+                        f.write(chunk)
+                        Stats.count('bytes downloaded', len(chunk))
+            except RequestException:
+                return None if resume else False
+        Stats.count('files downloaded')
+        
+        for algo, h in hashers.items():
+            if hashes and algo in hashes and h.hexdigest() != hashes[algo]:
+                print(f'The downloaded file {os.path.basename(path)!r} is corrupted ({algo} mismatch)')
+                safe_del(path_tmp)
+                return False
+        
+        link_file(path_tmp, path)
+        safe_del(path_tmp)
+        stat = os.stat(path)
+        for algo, h in hashers.items():
+            Cache.add_hash(path, stat, algo, h.hexdigest())
+        return True
+    
+    except (RequestException, OSError):
+        return False
+
+@Stats.timed('install')
+def apply_install_tasks(directory, data: MCSMP, tasks: list, jobs=DOWNLOAD_JOBS, executor=None):
+    with data.transaction(journal=True):
+        installed, errors = run_install_tasks(directory, data, tasks, jobs, executor)
+        if installed:
+            data.commit()
+    return installed, errors
+
+def run_install_tasks(directory, data: MCSMP, tasks: list, jobs=DOWNLOAD_JOBS, executor=None):
+    from concurrent.futures import ThreadPoolExecutor
+    
+    installed = []
+    errors = []
+    if not tasks:
+        return installed, errors
+    
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            return run_install_tasks(directory, data, tasks, jobs, executor)
+    
+    print(f'Downloading {len(tasks)} files for {directory!r}...')
+    results = executor.map(lambda t: download_file(t.version_file['url'], t.path_filename, t.version_file['hashes']), tasks)
+    
+    for task, ok in zip(tasks, results):
+        filename = task.version_file['filename']
+        if not ok:
+            if task.project_type:
+                print(f"Downloading fail! {filename!r}")
+                errors.append(task.urlslug)
             else:
-                data[project_type][urlslug] = filename
-                print(f'Done! The project {urlslug!r} has been installed in {directory!r}')
-            installed = True
+                print(f"Downloading additional assets fail! {filename!r}")
+            continue
         
-        if world:
-            if len(version_project['files']) >= 2:
-                assets_file = version_project['files'][1]
-                assets_path = join(data.path, 'resourcepacks', assets_file['filename'])
-                if hash_file(assets_path) != assets_file['hashes'][HASH_ALGO]:
-                    print("Downloading additional assets...")
-                    url = requests.get(assets_file['url'])
-                    if url.ok:
-                        with open(assets_path, 'wb') as f:
-                            f.write(url.content)
-                    else:
-                        print("Downloading additional assets fail!")
+        if task.path_filename_old:
+            safe_del(task.path_filename_old)
         
-        if disabled:
-            os.rename(path_filename, path_disabled(path_filename))
+        if not task.project_type:
+            print(f'Done! The additional assets of {task.urlslug!r} has been installed in {directory!r}')
+            continue
         
-        def get_id_slug(dependencie):
-            try:
-                v_slug = None
-                p_slug = None
-                versionid = dependencie['version_id']
-                
-                if versionid:
-                    v_slug = Cache.get_version(versionid)
-                    if not v_slug:
-                        projectid = json.loads(requests.get(link('version', versionid)).content)['project_id']
-                    else:
-                        projectid = None
-                else:
-                    projectid = dependencie['project_id']
-                
-                if projectid:
-                    p_slug = Cache.get_project(projectid)
-                
-                if not p_slug and projectid:
-                    full_project = json.loads(requests.get(link('project', projectid)).content)
-                    p_slug = full_project['slug']
-                    Cache.add_project(projectid, p_slug)
-                
-                if not v_slug and versionid and p_slug:
-                    Cache.add_version(versionid, p_slug)
-                
-                return p_slug or v_slug
-            except Exception:
-                return None
+        data.set_project(task.project_type, task.urlslug, filename, task.world)
+        if task.world:
+            print(f'Done! The project {task.urlslug!r} has been installed in the world {task.world!r} of {directory!r}')
+        else:
+            print(f'Done! The project {task.urlslug!r} has been installed in {directory!r}')
+        installed.append(task.urlslug)
+    
+    return installed, errors
+
+
+LOCKFILE = '.mcsmp.lock.json'
+
+def get_installed_files(data: MCSMP):
+    files = []
+    for type in project_types:
+        for urlslug in data[type]:
+            path_filename = get_project_file(data, type, urlslug)
+            if path_filename:
+                files.append((type, urlslug, None, path_filename))
+    for type in project_types_world:
+        for world in data[type]:
+            for urlslug in data[type][world]:
+                path_filename = get_project_file(data, type, urlslug, world)
+                if path_filename:
+                    files.append((type, urlslug, world, path_filename))
+    return files
+
+def fetch_versions_files(hashes):
+    if not hashes:
+        return {}
+    
+    url = requests.post(link('version_files'), json={'hashes': hashes, 'algorithm': HASH_ALGO})
+    if not url.ok:
+        return {}
+    return json.loads(url.content)
+
+def lock_entry(data: MCSMP, type, urlslug, world, path_filename, version_file, version):
+    disabled = path_filename.endswith('.disabled')
+    if disabled:
+        path_filename = path_filename[:-len('.disabled')]
+    return {
+        'type': type,
+        'project': urlslug,
+        'world': world,
+        'project_id': version['project_id'],
+        'version_id': version['id'],
+        'path': os.path.relpath(path_filename, data.path).replace('\\', '/'),
+        'disabled': disabled,
+        'url': version_file['url'],
+        'size': version_file['size'],
+        'hashes': {k:v for k,v in version_file['hashes'].items() if k in ['sha1', 'sha512']},
+    }
+
+def directory_lock(directory, lockfile=None):
+    data = MCSMP(directory, read_only=True)
+    lockfile = lockfile or join(data.path, LOCKFILE)
+    
+    files = get_installed_files(data)
+    files_hashes = hash_files([path_filename for _,_,_,path_filename in files])
+    hashes = {}
+    for type, urlslug, world, path_filename in files:
+        if files_hashes[path_filename]:
+            # the same file can be installed many times, like a datapack in many worlds
+            hashes.setdefault(files_hashes[path_filename][HASH_ALGO], []).append((type, urlslug, world, path_filename))
+    versions = fetch_versions_files(list(hashes.keys()))
+    
+    files = []
+    missing = []
+    assets = set()
+    for hash, entries in hashes.items():
+        version = versions.get(hash, None)
+        if not version:
+            missing.extend(urlslug for _,urlslug,_,_ in entries)
+            continue
         
-        def is_installed(dependencie):
-            for type in project_types:
-                if dependencie in data[type]:
-                    return True
+        version_file = [f for f in version['files'] if f['hashes'].get(HASH_ALGO, None) == hash][0]
+        for type, urlslug, world, path_filename in entries:
+            files.append(lock_entry(data, type, urlslug, world, path_filename, version_file, version))
             
-            return False
+            if world and len(version['files']) >= 2:
+                assets_file = version['files'][1]
+                assets_path = join(data.path, 'resourcepacks', assets_file['filename'])
+                if os.path.exists(assets_path) and assets_path not in assets:
+                    assets.add(assets_path)
+                    files.append(lock_entry(data, 'assets', urlslug, world, assets_path, assets_file, version))
+    
+    _json(lockfile, {
+        'game_version': data.version,
+        'loader': data.loader,
+        'loader_shader': data.loader_shader,
+        'files': sorted(files, key=lambda f: f['path']),
+    })
+    
+    print(f'Lockfile of {directory!r} written in {lockfile!r}: {len(files)} files')
+    if missing:
+        print('but... the following projects are unknown from Modrinth and are not in the lockfile:')
+        print(', '.join(missing))
+
+def directory_sync(directory, lockfile=None, mirror=None, jobs=DOWNLOAD_JOBS):
+    from urllib.parse import urlparse
+    
+    data = MCSMP(directory)
+    lockfile = lockfile or join(data.path, LOCKFILE)
+    if not os.path.exists(lockfile):
+        print(f"The lockfile {lockfile!r} doesn't exist")
+        return
+    lock = _json(lockfile)
+    
+    paths = [join(data.path, f['path']) for f in lock['files']]
+    files_hashes = hash_files(paths + [path_disabled(p) for p in paths])
+    has_hash = lambda path, hash: bool(files_hashes.get(path)) and files_hashes[path][HASH_ALGO] == hash
+    
+    tasks = []
+    locked = set()
+    assets = set()
+    present = 0
+    removed = []
+    with data.transaction(journal=True):
+        for k in ['game_version', 'loader', 'loader_shader']:
+            data[k] = lock.get(k, None)
         
-        dependencies = [get_id_slug(d) for d in version_project['dependencies'] if d['dependency_type'] in ['required', 'embedded']]
-        dependencies = {d for d in dependencies if d}
-        for kv in loaders_mods_swap.get(loader, {}).items():
-            if kv[0] in dependencies:
-                dependencies.remove(kv[0])
-                dependencies.add(kv[1])
-        dependencies = sorted(dependencies)
-        if dependencies:
+        for f in lock['files']:
+            type, urlslug, world = f['type'], f['project'], f['world']
+            path_filename = join(data.path, f['path'])
+            filename = os.path.basename(path_filename)
+            hash = f['hashes'][HASH_ALGO]
+            
+            url = f['url']
+            if mirror:
+                url = mirror.rstrip('/') + urlparse(url).path
+            version_file = {'url': url, 'filename': filename, 'size': f['size'], 'hashes': f['hashes']}
+            
+            if type == 'assets':
+                if has_hash(path_filename, hash):
+                    present += 1
+                elif path_filename not in assets:
+                    assets.add(path_filename)
+                    tasks.append(InstallTask(urlslug, None, world, None, version_file, path_filename, None))
+                continue
+            
+            locked.add((type, world, urlslug))
+            target = path_disabled(path_filename) if f['disabled'] else path_filename
             if world:
-                print('The project has dependencies, unfortunately, it is not possible to install them in a WORLD command mode')
-                print('You have install them manually: ' + ', '.join(dependencies))
+                filename_old = data[type].get(world, {}).get(urlslug, None)
             else:
-                dependencies = [d for d in dependencies if not is_installed(d)]
-                if dependencies:
-                    print('Installation of dependencies: ' + ', '.join(dependencies))
-                    for d in dependencies:
-                        if install_project_file(directory, data, d):
-                            installed = True
+                filename_old = data[type].get(urlslug, None)
+            
+            found = [p for p in [path_filename, path_disabled(path_filename)] if has_hash(p, hash)]
+            if found:
+                if found[0] != target:
+                    os.rename(found[0], target)
+                if filename_old != filename:
+                    data.set_project(type, urlslug, filename, world)
+                present += 1
+                continue
+            
+            path_filename_old = None
+            if filename_old and filename_old != filename:
+                path_filename_old = get_project_file(data, type, urlslug, world)
+            tasks.append(InstallTask(urlslug, type, world, None, version_file, target, path_filename_old))
         
-        return installed
-    
-    return False
-
-
-def project_uninstall(directory, urlslug, world=None):
-    urlslug = urlslug.lower()
-    data = MCSMP(directory)
-    test_version(directory, data)
-    
-    if world:
-        for type, pt in project_types_world.items():
-            if world in data[type] and urlslug in data[type][world]:
-                path_filename = join(data.path, 'saves', world, pt.folder, data[type][world][urlslug])
-                path_enable(data, type, urlslug, True, world)
-                safe_del(path_filename)
-                
-                del data[type][world][urlslug]
-                data.commit()
-                print(f'Project {urlslug!r} deleted from {directory!r}')
-                return
+        installed, errors = apply_install_tasks(directory, data, tasks, jobs)
         
-        print(f'The project {urlslug!r} is not installed in the world {world!r} of {directory!r}')
+        # the projects that are not locked are only removed once all the downloads succeeded
+        if not errors:
+            for type, urlslug, world, path_filename in get_installed_files(data):
+                if (type, world, urlslug) not in locked:
+                    safe_del(path_filename)
+                    data.set_project(type, urlslug, None, world)
+                    removed.append(urlslug)
+        data.commit()
     
-    else:
-        for type, pt in project_types.items():
-            if urlslug in data[type]:
-                path_filename = join(data.path, pt.folder, data[type][urlslug])
-                path_enable(data, type, urlslug, True)
-                safe_del(path_filename)
-                
-                del data[type][urlslug]
-                data.commit()
-                print(f'Project {urlslug!r} deleted from {directory!r}')
-                return
+    print()
+    print(f'Finaly! {directory!r} is synchronized with {lockfile!r}: {len(installed)} projects downloaded, {present} files already present, {len(removed)} projects removed')
+    if removed:
+        print('Removed projects: ' + ', '.join(removed))
+    if errors:
+        print('but... the following projects have suffered an error during their download:')
+        print(', '.join(errors))
+        print('The projects that are not in the lockfile have been kept, run the sync again to remove them')
+
+
+def get_directory_files(data: MCSMP):
+    # [(type, world, path_filename)] of all the files in the folders of the projects, managed or not
+    folders = [(type, None, join(data.path, pt.folder)) for type, pt in project_types.items()]
+    saves = join(data.path, 'saves')
+    if os.path.isdir(saves):
+        for world in sorted(os.listdir(saves)):
+            for type, pt in project_types_world.items():
+                folders.append((type, world, join(saves, world, pt.folder)))
+    
+    files = []
+    for type, world, folder in folders:
+        if os.path.isdir(folder):
+            for filename in sorted(os.listdir(folder)):
+                path_filename = join(folder, filename)
+                if os.path.isfile(path_filename) and not filename.startswith('.'):
+                    files.append((type, world, path_filename))
+    return files
+
+def directory_scan(directory, adopt=False, jobs=HASH_JOBS):
+    data = MCSMP(directory, read_only=not adopt)
+    files = get_directory_files(data)
+    
+    print(f'Hashing {len(files)} files of {directory!r}...')
+    files_hashes = hash_files([path_filename for _,_,path_filename in files], jobs=jobs)
+    hashes = [(files_hashes[path_filename] or {}).get(HASH_ALGO, None) for _,_,path_filename in files]
+    
+    versions = fetch_versions_files(sorted({hash for hash in hashes if hash}))
+    # the project type is needed too, the slug table can miss a project known by the project table
+    known = lambda id: Cache.get_project(id) and Cache.get_slug(Cache.get_project(id))
+    projects = fetch_projects_data(v['project_id'] for v in versions.values() if not known(v['project_id']))
+    
+    keys = set()
+    tracked = []
+    identified = []
+    conflicts = []
+    unknown = []
+    for (type, world, path_filename), hash in zip(files, hashes):
+        relpath = os.path.relpath(path_filename, data.path).replace('\\', '/')
+        filename = os.path.basename(path_filename)
+        if filename.endswith('.disabled'):
+            filename = filename[:-len('.disabled')]
+        
+        version = versions.get(hash, None)
+        urlslug = Cache.get_project(version['project_id']) if version else None
+        if not urlslug:
+            unknown.append(relpath)
+            continue
         
-        print(f'The project {urlslug!r} is not installed in {directory!r}')
+        Cache.add_version(version['id'], urlslug)
+        if type == 'resourcepack':
+            project_data = Cache.get_slug(urlslug) or projects.get(version['project_id'], {})
+            project_type = project_data.get('project_type', 'resourcepack')
+            if project_type == 'shader':
+                type = 'shader'
+            elif project_type != 'resourcepack':
+                # the assets of a datapack are managed with it
+                tracked.append(relpath)
+                continue
+        
+        if world:
+            filename_old = data[type].get(world, {}).get(urlslug, None)
+        else:
+            filename_old = data[type].get(urlslug, None)
+        
+        if filename_old == filename:
+            tracked.append(relpath)
+        elif filename_old:
+            conflicts.append((urlslug, relpath, filename_old))
+        elif (type, world, urlslug) in keys:
+            conflicts.append((urlslug, relpath, None))
+        else:
+            keys.add((type, world, urlslug))
+            identified.append((urlslug, type, world, filename, relpath))
+    
+    print()
+    if identified:
+        print('--== Untracked projects identified ==--')
+        for urlslug, type, world, filename, relpath in identified:
+            print(f'{urlslug}: {relpath}')
+        print()
+    if conflicts:
+        print('--== Duplicates of tracked projects (ignored) ==--')
+        for urlslug, relpath, filename_old in conflicts:
+            print(f'{urlslug}: {relpath}' + (f' (tracked file: {filename_old})' if filename_old else ''))
+        print()
+    if unknown:
+        print('--== Unknown files ==--')
+        for relpath in unknown:
+            print(relpath)
+        print()
+    
+    print(f'{len(files)} files: {len(tracked)} already tracked, {len(identified)} identified, {len(conflicts)} duplicates, {len(unknown)} unknown')
+    
+    if adopt and identified:
+        with data.transaction(journal=True):
+            for urlslug, type, world, filename, relpath in identified:
+                data.set_project(type, urlslug, filename, world)
+            data.commit()
+        print(f'Finaly! {len(identified)} projects has been adopted in {directory!r}')
+    elif identified:
+        print(f'Use "mcsmp adopt {directory}" to add the identified projects to the directory')
 
 
-def project_enable(directory, urlslug, enable, world=None):
-    urlslug = urlslug.lower()
-    data = MCSMP(directory)
-    
+def get_installed_type(data: MCSMP, urlslug, world=None):
     if world:
         for type in project_types_world:
             if world in data[type] and urlslug in data[type][world]:
-                path_enable(data, type, urlslug, enable, world)
-                if enable:
-                    print(f'Project {urlslug!r} in the world {world!r} of {directory!r} is now enabled')
-                else:
-                    print(f'Project {urlslug!r} in the world {world!r} of {directory!r} is now disabled')
-                return
-        
-        print(f'The project {urlslug!r} is not installed in the world {world!r} of {directory!r}')
-    
+                return type
     else:
         for type in project_types:
             if urlslug in data[type]:
-                path_enable(data, type, urlslug, enable)
-                if enable:
-                    print(f'Project {urlslug!r} in {directory!r}  is now enabled')
+                return type
+    return None
+
+def project_uninstall(directory, projects, world=None):
+    data = MCSMP(directory)
+    test_version(directory, data)
+    projects, world = get_target_world(data, projects, world)
+    
+    with data.transaction(journal=True):
+        for urlslug in expand_projects(data, projects, world):
+            type = get_installed_type(data, urlslug, world)
+            if not type:
+                if world:
+                    print(f'The project {urlslug!r} is not installed in the world {world!r} of {directory!r}')
                 else:
-                    print(f'Project {urlslug!r} in {directory!r} is now disabled')
-                return
+                    print(f'The project {urlslug!r} is not installed in {directory!r}')
+                continue
+            
+            if world:
+                path_filename = join(data.path, 'saves', world, project_types_world[type].folder, data[type][world][urlslug])
+            else:
+                path_filename = join(data.path, project_types[type].folder, data[type][urlslug])
+            path_enable(data, type, urlslug, True, world)
+            safe_del(path_filename)
+            
+            data.set_project(type, urlslug, None, world)
+            data.commit()
+            print(f'Project {urlslug!r} deleted from {directory!r}')
+
+
+def project_enable(directory, projects, enable, world=None):
+    data = MCSMP(directory)
+    projects, world = get_target_world(data, projects, world)
     
-        print(f'The project {urlslug!r} is not installed in {directory!r}')
+    for urlslug in expand_projects(data, projects, world):
+        type = get_installed_type(data, urlslug, world)
+        if world:
+            if not type:
+                print(f'The project {urlslug!r} is not installed in the world {world!r} of {directory!r}')
+                continue
+            path_enable(data, type, urlslug, enable, world)
+            if enable:
+                print(f'Project {urlslug!r} in the world {world!r} of {directory!r} is now enabled')
+            else:
+                print(f'Project {urlslug!r} in the world {world!r} of {directory!r} is now disabled')
+        
+        else:
+            if not type:
+                print(f'The project {urlslug!r} is not installed in {directory!r}')
+                continue
+            path_enable(data, type, urlslug, enable)
+            if enable:
+                print(f'Project {urlslug!r} in {directory!r} is now enabled')
+            else:
+                print(f'Project {urlslug!r} in {directory!r} is now disabled')
 
 
 def open_directory(directory, world=None):
-    data = MCSMP(directory)
+    data = MCSMP(directory, read_only=True)
     if world:
         if world in data.datapack:
             join(data.path, 'saves', world)
@@ -829,17 +2388,21 @@ def open_directory(directory, world=None):
 def project_info(urlslug):
     urlslug = urlslug.lower()
     urllink = link('project', urlslug)
-    url = requests.get(urllink)
-    if url.ok:
-        data = json.loads(url.content)
+    params = {
+        'loaders': '["datapack"]',
+        'include_changelog': 'false',
+    }
+    def get_datapack():
         try:
-            params = {
-                'loaders': '["datapack"]',
-                'include_changelog': 'false',
-            }
-            datapack = json.loads(requests.get(link('project', urlslug, 'version'), params=params).content)
+            return get_json(link('project', urlslug, 'version'), params) or []
         except Exception:
-            datapack = []
+            return []
+    
+    data, datapack = run_calls([
+        (urllink, get_json, (urllink,)),
+        (urllink, get_datapack, ()),
+    ])
+    if data is not None:
         
         data_display = data['title'] + ' ' + (data['project_type'] if not datapack else 'datapack')
         print('+-'+'-'*(len(data_display))+'-+')
@@ -881,12 +2444,19 @@ def project_info(urlslug):
     else:
         print(f"Error during url request, the project {urlslug} probably doesn't exist")
 
+def get_project_versions(urlslug):
+    project_data = get_project_data(urlslug)
+    if not project_data:
+        return None
+    
+    refresh_catalog(project_data['id'])
+    return project_data
+
 def project_versions_list(urlslug):
     urlslug = urlslug.lower()
-    urllink = link('project', urlslug, 'version')
-    url = requests.get(urllink)
-    if url.ok:
-        lst_version = json.loads(url.content)
+    project_data = get_project_versions(urlslug)
+    if project_data:
+        lst_version = Cache.get_catalog_versions(project_data['id'])
         
         msg = f'Versions for: {urlslug}'
         print('+'+'-'*(len(msg)+2)+'+')
@@ -922,23 +2492,13 @@ def project_versions_list(urlslug):
                 '|',
                 'Loaders:', e[2] + ' '*(loader_max-len(e[2])),
             )
-        
-    else:
-        print(f"Error during url request, the project {urlslug} probably doesn't exist")
+
 
 def project_version_info(urlslug, version):
     urlslug = urlslug.lower()
-    urllink = link('project', urlslug, 'version')
-    url = requests.get(urllink)
-    if url.ok:
-        lst_version = json.loads(url.content)
-        
-        version_data = None
-        for e in lst_version:
-            if e['version_number'] == version:
-                version_data = e
-                break
-        
+    project_data = get_project_versions(urlslug)
+    if project_data:
+        version_data = Cache.get_catalog_version(project_data['id'], version)
         if not version_data:
             print(f"Error durg retreving info version, the {version!r} of the project {urlslug} doesn't exist")
             return
@@ -957,7 +2517,7 @@ def project_version_info(urlslug, version):
         if len(version_data['game_versions']) == 1:
             game_versions = version_data['game_versions'][0]
         else:
-            game_versions = version_data['game_versions'][0] + '-' + e['game_versions'][-1]
+            game_versions = version_data['game_versions'][0] + '-' + version_data['game_versions'][-1]
         
         print('Version name:', version_data['name'])
         print('Minecraft supported:', game_versions)
@@ -967,10 +2527,7 @@ def project_version_info(urlslug, version):
         for f in version_data['files']:
             filename = f['filename']
             print(f'"{filename}"', '| sha1:', f['hashes']['sha1'])
-        
-        
-    else:
-        print(f"Error during url request, the project {urlslug} probably doesn't exist")
+
 
 def print_api(base_url, args=None):
     params = {}
@@ -1002,17 +2559,255 @@ def print_api(base_url, args=None):
         print(json.dumps(json.loads(url.content), indent=2))
     pass
 
+def daemon_socket(path=None):
+    return path or join(Cache._cachefolder, 'daemon.sock')
+
+def daemon_connect(path=None):
+    import socket
+    
+    path = daemon_socket(path)
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return None
+    
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.connect(path)
+    except OSError:
+        s.close()
+        return None
+    return s
+
+def daemon_client(args, path=None):
+    # send a command line to the daemon and print its output, return None if no daemon is running
+    import sys
+    
+    s = daemon_connect(path)
+    if not s:
+        return None
+    
+    with s, s.makefile('rwb') as f:
+        f.write(json.dumps({'args': args, 'cwd': os.getcwd()}).encode() + b'\n')
+        f.flush()
+        for line in f:
+            msg = json.loads(line)
+            if 'exit' in msg:
+                return msg['exit']
+            stream = sys.stderr if msg.get('stream', None) == 'err' else sys.stdout
+            stream.write(msg['text'])
+            stream.flush()
+    return 1
+
+def daemon_stop(path=None):
+    s = daemon_connect(path)
+    if not s:
+        print('No daemon is running')
+        return
+    
+    with s, s.makefile('rwb') as f:
+        f.write(json.dumps({'stop': True}).encode() + b'\n')
+        f.flush()
+        f.readline()
+    print('The daemon has been stopped')
+
+class DaemonOutput:
+    def __init__(self, wfile, stream, lock):
+        self.wfile = wfile
+        self.stream = stream
+        self.lock = lock
+    
+    def write(self, text):
+        with self.lock:
+            self.wfile.write(json.dumps({'stream': self.stream, 'text': text}).encode() + b'\n')
+            self.wfile.flush()
+        return len(text)
+    
+    def flush(self):
+        pass
+
+def run_daemon(path=None):
+    import socket
+    import socketserver
+    import traceback
+    from contextlib import redirect_stdout, redirect_stderr
+    from threading import Lock, Thread
+    
+    if not hasattr(socket, 'AF_UNIX'):
+        print('The daemon need the Unix sockets, that are not available on this system')
+        exit(1)
+    
+    path = daemon_socket(path)
+    if os.path.exists(path):
+        s = daemon_connect(path)
+        if s:
+            s.close()
+            print(f'A daemon is already running on {path!r}')
+            exit(1)
+        os.remove(path)
+    Cache._make_cachefolder()
+    cwd = os.getcwd()
+    
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            request = json.loads(self.rfile.readline() or b'{}')
+            if request.get('stop', None):
+                self.wfile.write(json.dumps({'exit': 0}).encode() + b'\n')
+                Thread(target=self.server.shutdown).start()
+                return
+            
+            args = request.get('args', [])
+            lock = Lock()
+            code = 1
+            with redirect_stdout(DaemonOutput(self.wfile, 'out', lock)), redirect_stderr(DaemonOutput(self.wfile, 'err', lock)):
+                try:
+                    if get_command(args) == 'daemon':
+                        print('The daemon is already running')
+                    else:
+                        os.chdir(request.get('cwd', cwd))
+                        code = run_command(args)
+                except Exception:
+                    # the error is sent to the client, the daemon keeps running
+                    try:
+                        traceback.print_exc()
+                    except OSError:
+                        pass
+                finally:
+                    os.chdir(cwd)
+            
+            try:
+                self.wfile.write(json.dumps({'exit': code}).encode() + b'\n')
+            except OSError:
+                pass
+    
+    with socketserver.UnixStreamServer(path, Handler) as server:
+        print(f'mcsmp daemon running on {path!r}, stop it with "mcsmp daemon --stop" or Ctrl+C')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.remove(path)
+
+
+def shell_completions(words):
+    # candidates for the next word of a command line of the shell
+    from contextlib import redirect_stdout
+    from io import StringIO
+    
+    args = []
+    skip = False
+    for w in words:
+        if skip:
+            skip = False
+        elif w in global_options_value or w == '--world':
+            skip = True
+        elif not w.startswith('-'):
+            args.append(w)
+    
+    if skip and words[-1] != '--world':
+        return ['sync', 'threads'] if words[-1] == '--engine' else []
+    if not args:
+        return list(commands.keys()) + ['help', 'exit']
+    
+    command, args = args[0], args[1:]
+    if command not in commands:
+        return []
+    _, _, _, directory, project, world = commands[command]
+    if command in ['list', 'update', 'lock', 'sync', 'scan', 'adopt', 'directory-remove']:
+        directory, world = True, command in ['list', 'update']
+    if not directory:
+        return []
+    if not args:
+        return list(root().keys())
+    
+    with redirect_stdout(StringIO()):
+        data = MCSMP(args[0], exit_if_error=False, read_only=True)
+    if not data or not data.path:
+        return []
+    
+    worlds = []
+    saves = join(data.path, 'saves')
+    if os.path.isdir(saves):
+        worlds = sorted(w for w in os.listdir(saves) if os.path.isdir(join(saves, w)))
+    
+    if skip:
+        return worlds
+    if project == 'many' and len(args) >= 1 or project and len(args) == 1:
+        if command == 'install':
+            return []
+        return sorted({urlslug for t in project_types for urlslug in data[t]} | {urlslug for t in project_types_world for w in data[t].values() for urlslug in w})
+    if world and len(args) == (2 if project else 1):
+        return worlds
+    return []
+
+def run_shell():
+    import shlex
+    try:
+        import readline
+    except ImportError:
+        readline = None
+    
+    if readline:
+        history = join(Cache._cachefolder, 'shell_history')
+        
+        def completer(text, state):
+            line = readline.get_line_buffer()[:readline.get_begidx()]
+            try:
+                words = shlex.split(line)
+            except ValueError:
+                words = line.split()
+            matches = [c for c in shell_completions(words) if c.startswith(text)]
+            return shlex.quote(matches[state]) if state < len(matches) else None
+        
+        readline.set_completer(completer)
+        readline.set_completer_delims(' \t\n')
+        readline.parse_and_bind('tab: complete')
+        try:
+            readline.read_history_file(history)
+        except OSError:
+            pass
+    
+    print('mcsmp shell, "help" to show the commands, "exit" or Ctrl+D to quit')
+    while True:
+        try:
+            line = input('mcsmp> ')
+        except EOFError:
+            print()
+            break
+        except KeyboardInterrupt:
+            print()
+            continue
+        
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            print(f'Invalid command: {e}')
+            continue
+        
+        if not args:
+            continue
+        if args[0] in ['exit', 'quit']:
+            break
+        if args[0] == 'help':
+            args = args[1:] + ['-h']
+        if get_command(args) in ['shell', 'daemon']:
+            print(f'The command {get_command(args)!r} is not available in the shell')
+            continue
+        
+        try:
+            run_command(args)
+        except KeyboardInterrupt:
+            print('Interrupted')
+        print()
+    
+    if readline:
+        Cache._make_cachefolder()
+        readline.set_history_length(1000)
+        readline.write_history_file(history)
+
+
 ## argparse
-parser = argparse.ArgumentParser(
-    description='Simple Modrinth Project Manager for Minecraft',
-)
-subparsers = parser.add_subparsers(
-    title='commands to execute',
-    metavar='<command>',
-    dest='command',
-    required=True,
-    description='In most case, the command take the form: <command> DIRECTORY PROJECT [WORLD]',
-)
+commands = {}
+parsers = {}
 
 def buid_parser(
     command: str,
@@ -1025,149 +2820,329 @@ def buid_parser(
     if not description:
         description = help[:1].upper()+help[1:]
     
-    parser = subparsers.add_parser(
-        name=command,
-        help='- '+help,
-        description=description,
+    def decorator(func):
+        commands[command] = (func, help, description, directory, project, world)
+        return func
+    return decorator
+
+built_parsers = {}
+
+def get_parser(command=None):
+    # only the subparser of a known command is built, all the subparsers are built for the help
+    if command not in commands:
+        command = None
+    if command in built_parsers:
+        return built_parsers[command]
+    
+    parser = argparse.ArgumentParser(
+        description='Simple Modrinth Project Manager for Minecraft',
+    )
+    parser.add_argument('--api-url', metavar='URL', type=str, default=API_URL_DEFAULT, help='base url of the Modrinth API (or of a compatible server)')
+    parser.add_argument('--cache-ttl', metavar='SECONDS', type=int, default=Cache.http_ttl_default, help='time before the cached API responses are revalidated')
+    parser.add_argument('--store', action='store_true', help='download the files once in a shared store of the cache, and hardlink them in the directories')
+    parser.add_argument('--stats', action='store_true', help='print the time of the phases, the requests and the cache usage at the end of the command')
+    parser.add_argument('--trace', metavar='PATH', type=str, help='write the stats and the timeline of the phases and requests in a Chrome trace file (JSON)')
+    parser.add_argument('--engine', choices=['sync', 'threads'], default='sync', help='network engine, "threads" runs the API requests of the searches in parallel in a pool of threads')
+    subparsers = parser.add_subparsers(
+        title='commands to execute',
+        metavar='<command>',
+        dest='command',
+        required=True,
+        description='In most case, the command take the form: <command> DIRECTORY PROJECT [WORLD]',
     )
     
-    if directory:
-        parser.add_argument('directory', metavar='DIRECTORY', type=str, help='name of the target directory')
-    if project:
-        parser.add_argument('project', metavar='PROJECT', type=str, help='slug of the target project')
-    if world:
-        parser.add_argument('world', metavar='WORLD', type=str, nargs='?', help='specific world to target')
+    for name, (func, help, description, directory, project, world) in commands.items():
+        if command in commands and name != command:
+            continue
+        
+        subparser = subparsers.add_parser(
+            name=name,
+            help='- '+help,
+            description=description,
+        )
+        
+        if directory:
+            subparser.add_argument('directory', metavar='DIRECTORY', type=str, help='name of the target directory')
+        if project == 'many':
+            subparser.add_argument('project', metavar='PROJECT', type=str, nargs='+', help='slugs of the target projects, glob patterns of the installed slugs (like "create-*") or @FILE lists of slugs')
+            subparser.add_argument('--world', metavar='WORLD', type=str, help='specific world to target (the form DIRECTORY PROJECT WORLD also works)')
+        elif project:
+            subparser.add_argument('project', metavar='PROJECT', type=str, help='slug of the target project')
+        if world:
+            subparser.add_argument('world', metavar='WORLD', type=str, nargs='?', help='specific world to target')
+        
+        func(subparser)
+        parsers[name] = subparser
     
+    built_parsers[command] = parser
     return parser
 
+global_options_value = ['--api-url', '--cache-ttl', '--trace', '--engine']
+
+def get_command(args):
+    # the first positional argument, after the global options
+    args = iter(args)
+    for a in args:
+        if a in global_options_value:
+            next(args, None)
+        elif not a.startswith('-'):
+            return a
+    return None
+
 
 # global
-args_list = buid_parser(
+@buid_parser(
     command='list',
     help='show all directory or project of a directory',
     description='Show configured directory or installed projects in a specified directory',
 )
-args_list.add_argument('directory', metavar='DIRECTORY', type=str, nargs='?', help='dispaly the projects for this directory')
-args_list.add_argument('world', metavar='WORLD', type=str, nargs='?', help='dispaly the datapacks for this world')
+def args_list(parser):
+    parser.add_argument('directory', metavar='DIRECTORY', type=str, nargs='?', help='dispaly the projects for this directory')
+    parser.add_argument('world', metavar='WORLD', type=str, nargs='?', help='dispaly the datapacks for this world')
 
 # directory setting
-args_directory_add = buid_parser(
+@buid_parser(
     command='directory-add',
     help='adding a configured directory',
     description='Add a directory a minecraft folder that will be contain mods, resourcepacks and datapacks',
 )
-args_directory_add.add_argument('directory', metavar='DIRECTORY', type=str, help='name of the directory')
-args_directory_add.add_argument('path', metavar='PATH', type=str, help='target path of the directory, must the root of a /.minecraft/ folder')
+def args_directory_add(parser):
+    parser.add_argument('directory', metavar='DIRECTORY', type=str, help='name of the directory')
+    parser.add_argument('path', metavar='PATH', type=str, help='target path of the directory, must the root of a /.minecraft/ folder')
 
-args_directory_remove = buid_parser(
+@buid_parser(
     command='directory-remove',
     help='remove a configured directory',
     description='Remove a configured directory from the setting',
 )
-args_directory_add.add_argument('directory', metavar='DIRECTORY', type=str, help='name of a directory')
+def args_directory_remove(parser):
+    parser.add_argument('directory', metavar='DIRECTORY', type=str, help='name of a directory')
 
-args_version = buid_parser(
+@buid_parser(
     command='version',
     help='Minecraft version for a directory',
     description='Show or edit the Minecraft version for a directory',
     directory=True,
 )
-args_version.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target version of Minecraft to set')
+def args_version(parser):
+    parser.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target version of Minecraft to set')
 
-args_loader = buid_parser(
+@buid_parser(
     command='loader',
     help='Loader for a directory',
     description='Show or edit the Loader used for a directory',
     directory=True,
 )
-args_loader.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target Loader to set')
+def args_loader(parser):
+    parser.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target Loader to set')
 
-args_loader = buid_parser(
+@buid_parser(
     command='shader',
     help='Shader loader for a directory',
     description='Show or edit the Shader loader used for a directory',
     directory=True,
 )
-args_loader.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target Shader loader to set')
+def args_shader(parser):
+    parser.add_argument('id', metavar='ID', type=str, nargs='?', help='id of the new target Shader loader to set')
 
 # manage project's
-buid_parser(
+@buid_parser(
     command='check',
     help='check if the project is installed',
     directory=True,
     project=True,
     world=True,
 )
-buid_parser(
+def args_check(parser):
+    pass
+
+@buid_parser(
     command='install',
-    help='install/update a project',
+    help='install/update projects',
     directory=True,
-    project=True,
-    world=True,
+    project='many',
 )
-buid_parser(
+def args_install(parser):
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=DOWNLOAD_JOBS, help='number of parallel downloads')
+
+@buid_parser(
     command='enable',
-    help='enable a project',
+    help='enable projects',
     directory=True,
-    project=True,
-    world=True,
+    project='many',
 )
-buid_parser(
+def args_enable(parser):
+    pass
+
+@buid_parser(
     command='disable',
-    help='disable a project',
+    help='disable projects',
     directory=True,
-    project=True,
-    world=True,
+    project='many',
 )
-buid_parser(
+def args_disable(parser):
+    pass
+
+@buid_parser(
     command='uninstall',
-    help='uninstall a project',
+    help='uninstall projects',
     directory=True,
-    project=True,
-    world=True,
+    project='many',
 )
-buid_parser(
+def args_uninstall(parser):
+    pass
+
+@buid_parser(
     command='update',
     help='update all projects in a directory or for a world',
+)
+def args_update(parser):
+    parser.add_argument('directory', metavar='DIRECTORY', type=str, nargs='?', help='name of the target directory')
+    parser.add_argument('world', metavar='WORLD', type=str, nargs='?', help='specific world to target')
+    parser.add_argument('--all', action='store_true', help='update all the configured directories')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=DOWNLOAD_JOBS, help='number of parallel downloads')
+    parser.add_argument('--plan', action='store_true', help="only show the pending changes and the download size, don't touch any file")
+    parser.add_argument('--json', action='store_true', help='output the plan as JSON')
+
+@buid_parser(
+    command='lock',
+    help='write a lockfile of the installed projects',
+    description='Write a lockfile with the exact version, url and hashes of every installed project of a directory',
+    directory=True,
+)
+def args_lock(parser):
+    parser.add_argument('--file', metavar='PATH', type=str, help=f'path of the lockfile (default: {LOCKFILE} in the directory)')
+
+@buid_parser(
+    command='scan',
+    help='identify the files not installed by mcsmp',
+    description='Identify with their hashes the files of a directory that are not tracked by mcsmp',
+    directory=True,
+)
+def args_scan(parser):
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=HASH_JOBS, help='number of files hashed in parallel')
+
+@buid_parser(
+    command='adopt',
+    help='track the files not installed by mcsmp',
+    description='Identify with their hashes the files of a directory that are not tracked by mcsmp and add them to the directory',
+    directory=True,
+)
+def args_adopt(parser):
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=HASH_JOBS, help='number of files hashed in parallel')
+
+@buid_parser(
+    command='sync',
+    help='install exactly the projects of a lockfile',
+    description='Download and verify exactly the files of a lockfile, without searching the projects on Modrinth',
     directory=True,
-    world=True,
 )
-buid_parser(
+def args_sync(parser):
+    parser.add_argument('--file', metavar='PATH', type=str, help=f'path of the lockfile (default: {LOCKFILE} in the directory)')
+    parser.add_argument('--mirror', metavar='URL', type=str, help='base url of a mirror of the Modrinth files to download from')
+    parser.add_argument('--jobs', '-j', metavar='N', type=int, default=DOWNLOAD_JOBS, help='number of parallel downloads')
+
+@buid_parser(
     command='open',
     help='open the folder of a directory',
     directory=True,
     world=True,
 )
+def args_open(parser):
+    pass
 
 # utility
-args_info = buid_parser(
+@buid_parser(
     command='info',
     help='list various info about a project',
     project=True,
 )
-args_info_group = args_info.add_mutually_exclusive_group()
-args_info_group.add_argument('--list-versions', action='store_true', help='list all versions availide')
-args_info_group.add_argument('--version', metavar='VERSION', type=str, help='show the info for a specific version')
+def args_info(parser):
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--list-versions', action='store_true', help='list all versions availide')
+    group.add_argument('--version', metavar='VERSION', type=str, help='show the info for a specific version')
 
-args_api = buid_parser(
+@buid_parser(
     command='api',
     help='print a API request',
     description='Print a API request',
 )
-args_api.add_argument('url', metavar='URL', type=str, help='url of the API request')
-args_api.add_argument('--', dest='params', metavar='PARAMS', type=str, nargs='+', default=[], help='parameters to apply to the API request')
+def args_api(parser):
+    parser.add_argument('url', metavar='URL', type=str, help='url of the API request')
+    parser.add_argument('--', dest='params', metavar='PARAMS', type=str, nargs='+', default=[], help='parameters to apply to the API request')
 
-args_clear_cache = buid_parser(
+@buid_parser(
     command='clear-cache',
     help='clear the cache',
     description='Clear the cache, or specific cache files',
 )
-args_clear_cache.add_argument('files', metavar='FILES', type=str, nargs='*', default=[], help='specific cache files to remove')
+def args_clear_cache(parser):
+    parser.add_argument('files', metavar='FILES', type=str, nargs='*', default=[], help='specific cache files to remove')
+    parser.add_argument('--gc', action='store_true', help='only remove the files of the store that are no longer used by any directory')
+
+@buid_parser(
+    command='daemon',
+    help='keep mcsmp running to execute the commands faster',
+    description='Run mcsmp as a daemon that execute the commands sent on a Unix socket, with its caches and connections kept open. The commands are sent to it when the environment variable MCSMP_DAEMON is set',
+)
+def args_daemon(parser):
+    parser.add_argument('--socket', metavar='PATH', type=str, help='path of the Unix socket (default: daemon.sock in the cache folder)')
+    parser.add_argument('--stop', action='store_true', help='stop the running daemon')
+
+@buid_parser(
+    command='shell',
+    help='run the commands in an interactive shell',
+    description='Run the commands in an interactive shell that keep the caches and connections between them, with the completion of the directorys, projects and worlds',
+)
+def args_shell(parser):
+    pass
 
 
-def main():
-    args = parser.parse_args()
+def main(args=None):
+    global API_URL
+    
+    if args is None:
+        from sys import argv
+        args = argv[1:]
+        if os.environ.get('MCSMP_DAEMON', None) and get_command(args) != 'daemon':
+            code = daemon_client(args)
+            if code is not None:
+                exit(code)
+    
+    parser = get_parser(get_command(args))
+    args = parser.parse_args(args)
+    API_URL = args.api_url
+    Cache.http_ttl = args.cache_ttl
+    Cache.store = args.store
+    Cache.reset_timeout()
+    ThreadEngine.enabled = args.engine == 'threads'
+    requests.retried = 0
+    requests.set_pool_size(getattr(args, 'jobs', 0))
+    if args.stats or args.trace:
+        Stats.enable(args.trace)
+    
+    try:
+        run(parser, args)
+    finally:
+        Cache.evict_responses()
+        if Stats.enabled:
+            Stats.at_exit(args.stats)
     
+    if requests.retried:
+        print(f'Note: {requests.retried} requests have been retried because of network errors or of the rate limit of the server')
+
+def run_command(args):
+    # run a command line in the current process, and return its exit code instead of exiting
+    try:
+        main(args)
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code)
+        return 1
+
+def run(parser, args):
     if args.command == 'list':
         if args.world is not None:
             list_world_projects(args.directory, args.world)
@@ -1190,7 +3165,7 @@ def main():
     elif args.command == 'check':
         project_check(args.directory, args.project, args.world)
     elif args.command == 'install':
-        project_install(args.directory, args.project, args.world)
+        project_install(args.directory, args.project, args.world, args.jobs)
     elif args.command == 'enable':
         project_enable(args.directory, args.project, True, args.world)
     elif args.command == 'disable':
@@ -1198,7 +3173,27 @@ def main():
     elif args.command == 'uninstall':
         project_uninstall(args.directory, args.project, args.world)
     elif args.command == 'update':
-        project_update(args.directory, args.world)
+        if args.json:
+            args.plan = 'json'
+        elif args.plan:
+            args.plan = 'text'
+        else:
+            args.plan = None
+        
+        if args.all:
+            project_update_all(args.jobs, args.plan)
+        elif args.directory:
+            project_update(args.directory, args.world, args.jobs, args.plan)
+        else:
+            parsers['update'].error('the argument DIRECTORY or --all is required')
+    elif args.command == 'lock':
+        directory_lock(args.directory, args.file)
+    elif args.command == 'sync':
+        directory_sync(args.directory, args.file, args.mirror, args.jobs)
+    elif args.command == 'scan':
+        directory_scan(args.directory, False, args.jobs)
+    elif args.command == 'adopt':
+        directory_scan(args.directory, True, args.jobs)
     elif args.command == 'open':
         open_directory(args.directory, args.world)
     
@@ -1212,7 +3207,17 @@ def main():
     elif args.command == 'api':
         print_api(args.url, args.params)
     elif args.command == 'clear-cache':
-        Cache.clear_cache(args.files)
+        if args.gc:
+            Cache.gc_store()
+        else:
+            Cache.clear_cache(args.files)
+    elif args.command == 'shell':
+        run_shell()
+    elif args.command == 'daemon':
+        if args.stop:
+            daemon_stop(args.socket)
+        else:
+            run_daemon(args.socket)
     else:
         parser.print_help()
 
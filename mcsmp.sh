@@ -4,11 +4,4 @@ SCRIPT=$(readlink -f "$0")
 # Absolute path this script is in, thus /home/user/bin
 SCRIPTPATH=$(dirname "$SCRIPT")
 
-
-while :
-do
-  read -p "mcsmp.py " cmd
-  python $SCRIPTPATH/mcsmp.py $cmd
-  cmd=""
-  echo
-done
+PYTHONPATH="$SCRIPTPATH" python -m mcsmp shell